@@ -7,11 +7,28 @@ Python port of MMArchiveCLI.dpr
 import sys
 import os
 import json
+import hashlib
+import shutil
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import redirect_stdout
+from functools import lru_cache, partial
+from io import StringIO
 from pathlib import Path
 from src.RSLod_complete import *
 from src.RSDef import TRSDefWrapper
 
-CLI_VERSION = '1.4.1-py'
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+CLI_VERSION = '1.4.55-py'
 
 _def_config_cache = None
 
@@ -35,6 +52,28 @@ def _load_def_config():
     return _def_config_cache
 
 
+# Eagerly bind config lookups used by the per-DEF predicates
+_def_config = _load_def_config()
+_HOTA_SHADOW_P2P3 = _def_config.get('hotaShadowP2P3', set())
+_HOTA_PAL255_TO_5 = _def_config.get('hotaPalette255To5', set())
+_KEEP_SEL_PAL = _def_config.get('keepSelectionPalette', set())
+_CREATURES_WITH_ATTACK2 = set(_def_config.get('creaturesWithAttack2', []))
+_CREATURES_WITH_CAST = set(_def_config.get('creaturesWithCast', []))
+_CROP_BOUNDS = _def_config.get('cropBounds', {})
+
+# DEF type as used in defConfig.json <-> TypeOfDef header value
+_TYPE_STR_TO_HEX = {'2': 0x42, '3': 0x43, '4': 0x44, '9': 0x49}
+_TYPE_HEX_TO_STR = {v: k for k, v in _TYPE_STR_TO_HEX.items()}
+
+_KNOWN_CMDS = frozenset({'list', 'extract', 'add', 'extractdef', 'extractwebp', 'testdef'})
+_EXTRACT_CMDS = frozenset({'extract', 'extractdef', 'extractwebp'})
+_GROUP_NAMES = {
+    0x42: _def_config.get('creatureGroupNames', {}),
+    0x44: _def_config.get('mapObjectGroupNames', {}),
+    0x49: _def_config.get('heroGroupNames', {})
+}
+
+
 
 
 class Config:
@@ -51,26 +90,20 @@ class Config:
         self.shadow_in_main = False
 
 
+@lru_cache(maxsize=1024)
 def get_group_name(group_index, type_of_def, creature_name=''):
     """Get human-readable group name based on DEF type and index"""
-    config = _load_def_config()
-    type_map = {
-        0x42: config.get('creatureGroupNames', {}),
-        0x44: config.get('mapObjectGroupNames', {}),
-        0x49: config.get('heroGroupNames', {})
-    }
-    
-    if type_of_def in type_map:
-        names = type_map[type_of_def]
+    if type_of_def in _GROUP_NAMES:
+        names = _GROUP_NAMES[type_of_def]
         group_name = names.get(str(group_index))
         if group_name:
             
             # Special handling for creature groups 17-19
             if type_of_def == 0x42 and group_index in [17, 18, 19]:
                 direction = ['Up', 'Straight', 'Down'][group_index - 17]
-                if creature_name in config.get('creaturesWithAttack2', []):
+                if creature_name in _CREATURES_WITH_ATTACK2:
                     return f'Attack {direction} 2'
-                elif creature_name in config.get('creaturesWithCast', []):
+                elif creature_name in _CREATURES_WITH_CAST:
                     return f'Cast {direction}'
             
             return group_name
@@ -79,22 +112,11 @@ def get_group_name(group_index, type_of_def, creature_name=''):
 
 def most_repeated_frame(frames):
     """Find the index of the most repeated frame"""
-    frame_counts = {}
-    for i, frame in enumerate(frames):
-        frame_name = frame if isinstance(frame, str) else str(frame)
-        if frame_name in frame_counts:
-            frame_counts[frame_name].append(i)
-        else:
-            frame_counts[frame_name] = [i]
-    
-    max_count = 0
-    most_repeated = 0
-    for frame_name, indices in frame_counts.items():
-        if len(indices) > max_count:
-            max_count = len(indices)
-            most_repeated = indices[0]
-    
-    return most_repeated
+    if not frames:
+        return 0
+    # Frame names are always strings (DEF picture names or HDL paths)
+    most_repeated, _ = Counter(frames).most_common(1)[0]
+    return frames.index(most_repeated)
 
 
 _objects_cache = None
@@ -113,6 +135,7 @@ def _load_objects():
     return _objects_cache
 
 
+@lru_cache(maxsize=4096)
 def isAdvMapCreature(def_name):
     """Check if DEF is adventure map creature"""
     objects = _load_objects()
@@ -120,28 +143,29 @@ def isAdvMapCreature(def_name):
     return isinstance(obj, dict) and obj.get('sub_type') == 'creature'
 
 
+@lru_cache(maxsize=4096)
 def uses_hota_shadow_p2p3(def_name, archive_path='', prefer_hota=False):
     """Check if object uses HotA palette 2/3 for shadow"""
     if 'HotA' not in archive_path and not prefer_hota:
         return False
-    config = _load_def_config()
-    return def_name.lower() in config.get('hotaShadowP2P3', set())
+    return def_name.lower() in _HOTA_SHADOW_P2P3
 
 
+@lru_cache(maxsize=4096)
 def needs_palette_255_fix(def_name, archive_path='', prefer_hota=False):
     """Check if palette 255 should be replaced with palette 5"""
     if 'HotA' not in archive_path and not prefer_hota:
         return False
-    config = _load_def_config()
-    return def_name.lower() in config.get('hotaPalette255To5', set())
+    return def_name.lower() in _HOTA_PAL255_TO_5
 
 
+@lru_cache(maxsize=4096)
 def keeps_selection_palette(def_name):
     """Check if selection palette should be kept (not made transparent)"""
-    config = _load_def_config()
-    return def_name.lower() in config.get('keepSelectionPalette', set())
+    return def_name.lower() in _KEEP_SEL_PAL
 
 
+@lru_cache(maxsize=4096)
 def get_name(def_name, archive_path='', prefer_hota=False):
     """Get name from objectsByID.json with HotA support"""
     objects = _load_objects()
@@ -169,6 +193,7 @@ def get_frame_durations(frames, def_type, group_id, def_name=''):
     """Calculate frame durations based on DEF type and group"""
     durations = []
     pNum = most_repeated_frame(frames)
+    adv_map_creature = def_type == '3' and isAdvMapCreature(def_name)
     
     for num in range(len(frames)):
         if def_type == '9' and group_id == 4 and num == 5:
@@ -177,7 +202,7 @@ def get_frame_durations(frames, def_type, group_id, def_name=''):
             durations.append(1000/8)
         elif def_type == '2' and group_id == 2 and num == 7:
             durations.append(3000)
-        elif def_type == '3' and isAdvMapCreature(def_name) and num == pNum:
+        elif adv_map_creature and num == pNum:
             durations.append(1000)
         elif def_type == '3':
             durations.append(1000/6)
@@ -225,6 +250,18 @@ def show_help():
     print('  MMArchiveCLI.py version')
 
 
+# Switches that just set a Config attribute
+_CONFIG_FLAGS = {
+    '--no-shadow': ('extract_with_shadow', False),
+    '--24bits': ('extract_in_24_bits', True),
+    '--strict-errors': ('ignore_unzip_errors', False),
+    '--individual-crop': ('individual_crop', True),
+    '--hota': ('prefer_hota_names', True),
+    '--hdl-structure': ('hdl_structure', True),
+    '--shadow-in-main': ('shadow_in_main', True),
+}
+
+
 def parse_args():
     """Parse command line arguments"""
     if len(sys.argv) < 2:
@@ -238,7 +275,7 @@ def parse_args():
     if cmd == 'version':
         return 'version', None, None, None, None, None
     
-    if cmd in ['list', 'extract', 'add', 'extractdef', 'extractwebp', 'testdef']:
+    if cmd in _KNOWN_CMDS:
         if len(sys.argv) < 3:
             return 'help', None, None, None, None, None
         
@@ -259,14 +296,9 @@ def parse_args():
             elif sys.argv[i] == '-f' and i + 1 < len(sys.argv):
                 file_filter = sys.argv[i + 1].lower()
                 i += 2
-            elif sys.argv[i] == '--no-shadow':
-                config.extract_with_shadow = False
-                i += 1
-            elif sys.argv[i] == '--24bits':
-                config.extract_in_24_bits = True
-                i += 1
-            elif sys.argv[i] == '--strict-errors':
-                config.ignore_unzip_errors = False
+            elif sys.argv[i] in _CONFIG_FLAGS:
+                attr, value = _CONFIG_FLAGS[sys.argv[i]]
+                setattr(config, attr, value)
                 i += 1
             elif sys.argv[i] == '--no-crop':
                 if i + 1 < len(sys.argv) and not sys.argv[i + 1].startswith('-'):
@@ -278,22 +310,10 @@ def parse_args():
                     # Disable cropping for all types
                     config.crop_frames = False
                     i += 1
-            elif sys.argv[i] == '--individual-crop':
-                config.individual_crop = True
-                i += 1
-            elif sys.argv[i] == '--hota':
-                config.prefer_hota_names = True
-                i += 1
-            elif sys.argv[i] == '--hdl-structure':
-                config.hdl_structure = True
-                i += 1
-            elif sys.argv[i] == '--shadow-in-main':
-                config.shadow_in_main = True
-                i += 1
             else:
                 i += 1
         
-        if output is None and cmd in ['extract', 'extractdef', 'extractwebp']:
+        if output is None and cmd in _EXTRACT_CMDS:
             base = Path(archive).stem.replace('.', '_')
             suffix = '_deftool' if cmd == 'extractdef' else '_webp' if cmd == 'extractwebp' else ''
             output = str(Path(archive).parent / f"{base}{suffix}")
@@ -305,6 +325,17 @@ def parse_args():
     return 'help', None, None, None, None, None
 
 
+# Lines per console write for per-file output
+_LOG_BATCH = 100
+
+
+def _write_lines(lines):
+    """Write buffered output lines in one call and clear the buffer"""
+    if lines:
+        sys.stdout.write('\n'.join(lines) + '\n')
+        lines.clear()
+
+
 def list_archive(archive_path, config):
     """List files in archive"""
     try:
@@ -319,8 +350,10 @@ def list_archive(archive_path, config):
         
         print('Name')
         print('----')
-        for i in range(archive.count):
-            print(archive.get_file_name(i))
+        # Write names in batches instead of one print per file
+        for start in range(0, archive.count, 4096):
+            names = [archive.get_file_name(i) for i in range(start, min(start + 4096, archive.count))]
+            sys.stdout.write('\n'.join(names) + '\n')
     except ERSLodException as e:
         print(f'Error: {e}')
         return 1
@@ -332,32 +365,43 @@ def list_archive(archive_path, config):
     return 0
 
 
+def _def_entries(archive):
+    """List (index, name) of DEF files in archive, names read once"""
+    names = [archive.get_file_name(i).rstrip('\x00') for i in range(archive.count)]
+    return [(i, name) for i, name in enumerate(names) if Path(name).suffix.lower() == '.def']
+
+
 def extract_archive(archive_path, output_path, file_filter, config):
     """Extract files from archive"""
     try:
         archive = rs_load_mm_archive(archive_path)
         archive.files.ignore_unzip_errors = config.ignore_unzip_errors
         
-        filtered_count = sum(1 for i in range(archive.count)
-                           if not file_filter or Path(archive.get_file_name(i)).suffix.lower() in file_filter)
+        # Collect matching names in a single pass
+        wanted = []
+        for i in range(archive.count):
+            name = archive.get_file_name(i).rstrip('\x00')  # Remove null terminators
+            if not file_filter or Path(name).suffix.lower() in file_filter:
+                wanted.append((i, name))
         
-        print(f'Extracting {filtered_count} files to: {output_path}')
+        print(f'Extracting {len(wanted)} files to: {output_path}')
         
         Path(output_path).mkdir(parents=True, exist_ok=True)
         
-        for i in range(archive.count):
-            name = archive.get_file_name(i).rstrip('\x00')  # Remove null terminators
-            if file_filter and Path(name).suffix.lower() not in file_filter:
-                continue
-            
+        # Per-file status lines are written in batches
+        log = []
+        for i, name in wanted:
             try:
                 extracted = archive.extract(i, output_path, True)
                 if extracted:
-                    print(f'Extracted: {Path(extracted).name}')
+                    log.append(f'Extracted: {Path(extracted).name}')
                 else:
-                    print(f'Skipped: {name}')
+                    log.append(f'Skipped: {name}')
             except Exception as e:
-                print(f'Error extracting {name}: {e}')
+                log.append(f'Error extracting {name}: {e}')
+            if len(log) >= _LOG_BATCH:
+                _write_lines(log)
+        _write_lines(log)
         
         print('Extraction complete.')
     except ERSLodException as e:
@@ -380,13 +424,10 @@ def add_to_archive(archive_path, target_path, config):
         archive = rs_load_mm_archive(archive_path)
         archive.files.ignore_unzip_errors = config.ignore_unzip_errors
         
+        # Stream straight from the file instead of buffering a copy
+        file_name = Path(target_path).name
         with open(target_path, 'rb') as f:
-            file_data = f.read()
-            file_name = Path(target_path).name
-        
-        from io import BytesIO
-        data_stream = BytesIO(file_data)
-        archive.add(file_name, data_stream)
+            archive.add(file_name, f)
         print(f'Added: {file_name}')
         
         # Force save to write buffers immediately
@@ -418,22 +459,26 @@ def test_def_files(archive_path, config):
             
             print(f'Testing DEF files in archive: {archive.count} total files')
             
-            def_count = 0
-            error_count = 0
+            def_entries = _def_entries(archive)
             
-            for i in range(archive.count):
-                name = archive.get_file_name(i).rstrip('\x00')
-                if Path(name).suffix.lower() != '.def':
-                    continue
-                
-                def_count += 1
+            def test_entry(entry):
+                i, name = entry
                 try:
-                    def_data = archive.extract_array(i)
-                    def_wrapper = TRSDefWrapper(bytes(def_data))
-                    # Only print errors, not successful tests
+                    TRSDefWrapper(archive.extract_array(i))
                 except Exception as e:
-                    print(f'✗ {name}: {e}')
-                    error_count += 1
+                    return f'✗ {name}: {e}'
+                return None
+            
+            # Each extract opens its own read handle, so zlib inflate of one
+            # DEF can overlap with parsing of another
+            def_count = len(def_entries)
+            error_count = 0
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                for error in executor.map(test_entry, def_entries):
+                    # Only print errors, not successful tests
+                    if error:
+                        print(error)
+                        error_count += 1
             
             print(f'\nTesting complete: {def_count} DEF files tested, {error_count} errors')
             return 1 if error_count > 0 else 0
@@ -448,20 +493,20 @@ def parse_hdl(hdl_path):
     with open(hdl_path, 'r') as f:
         content = f.read()
     
-    # Get type
-    type_line = [l for l in content.split('\n') if l.startswith('Type=')]
-    def_type = type_line[0].split('=')[1] if type_line else '3'
+    # Index key=value lines once, first occurrence wins
+    values = {}
+    for line in content.splitlines():
+        key, sep, value = line.partition('=')
+        if sep:
+            values.setdefault(key, value)
+    
+    def_type = values.get('Type', '3')
     
     groups = []
     group_idx = 0
-    while f'Group{group_idx}=' in content:
-        line = [l for l in content.split('\n') if l.startswith(f'Group{group_idx}=')][0]
-        frames = [f.strip() for f in line.split('=')[1].split('|') if f.strip()]
-        
-        shadow_line = [l for l in content.split('\n') if l.startswith(f'Shadow{group_idx}=')]
-        shadows = []
-        if shadow_line:
-            shadows = [f.strip() for f in shadow_line[0].split('=')[1].split('|') if f.strip()]
+    while f'Group{group_idx}' in values:
+        frames = [f.strip() for f in values[f'Group{group_idx}'].split('|') if f.strip()]
+        shadows = [f.strip() for f in values.get(f'Shadow{group_idx}', '').split('|') if f.strip()]
         
         groups.append({'group_id': group_idx, 'frames': frames, 'shadows': shadows})
         group_idx += 1
@@ -469,10 +514,180 @@ def parse_hdl(hdl_path):
     return def_type, groups
 
 
+def _pixels_u32(arr):
+    """View contiguous RGBA array as one little-endian uint32 per pixel"""
+    return arr.view('<u4')[..., 0]
+
+
+def _rgb_keys(arr):
+    """Pack RGB of each RGBA pixel into a single uint32 for fast compares"""
+    return _pixels_u32(arr) & 0xFFFFFF
+
+
+def _color_mask(keys, color):
+    """Boolean mask of packed pixel keys matching RGB color"""
+    r, g, b = color[:3]
+    return keys == (r | g << 8 | b << 16)
+
+
+def _apply_shadow_palette(arr, colors, keep_sel, p2p3, clear_other=False):
+    """Recolor RGBA array in place using the 8 DEF shadow palette colors
+    
+    Clear wins over edge and edge wins over body, like the per-pixel checks
+    this replaces. With clear_other every unmatched pixel is cleared too.
+    """
+    keys = _rgb_keys(arr)
+    transparent, edge, body_two, edge_two, body, selection, body_sel, edge_sel = colors
+    
+    m_clear = _color_mask(keys, transparent)
+    if not keep_sel:
+        m_clear |= _color_mask(keys, selection)
+    m_edge = _color_mask(keys, edge) | _color_mask(keys, edge_sel)
+    m_body = _color_mask(keys, body) | _color_mask(keys, body_sel)
+    if p2p3:
+        m_edge |= _color_mask(keys, edge_two)
+        m_body |= _color_mask(keys, body_two)
+    m_edge &= ~m_clear
+    m_body &= ~(m_clear | m_edge)
+    if clear_other:
+        m_clear = ~(m_edge | m_body)
+    
+    # One uint32 store per pixel instead of four byte stores
+    pixels = _pixels_u32(arr)
+    np.putmask(pixels, m_clear, 0)
+    np.putmask(pixels, m_edge, 127 << 24)
+    np.putmask(pixels, m_body, 191 << 24)
+    return arr
+
+
+def _recolor(arr, colors, keep_sel, p2p3, role):
+    """Recolor RGBA array in place as a 'main' frame, a 'main_shadow' frame
+    (shadow_in_main) or a 'shadow' image"""
+    if role == 'shadow':
+        return _apply_shadow_palette(arr, colors, keep_sel, p2p3, clear_other=True)
+    np.putmask(_pixels_u32(arr), _color_mask(_rgb_keys(arr), colors[0]), 0)
+    if role == 'main_shadow':
+        # Process main image as if it contains shadows
+        _apply_shadow_palette(arr, colors, keep_sel, p2p3)
+    return arr
+
+
+@lru_cache(maxsize=64)
+def _palette_lut(palette, transparency, recolor_args, replace_colors=None):
+    """Recolored uint32 RGBA lookup table for a raw RGB palette
+    
+    Frames of a DEF share their palette, so this is built once per DEF
+    instead of once per frame. replace_colors is applied to the table too.
+    """
+    palette = np.frombuffer(palette, dtype=np.uint8).reshape(-1, 3)[:256]
+    lut = np.zeros((256, 4), dtype=np.uint8)
+    lut[:, 3] = 255
+    lut[:len(palette), :3] = palette
+    # Same alpha as convert('RGBA') gives for tRNS entries
+    if isinstance(transparency, int):
+        lut[transparency, 3] = 0
+    elif isinstance(transparency, bytes):
+        lut[:len(transparency), 3] = np.frombuffer(transparency[:256], dtype=np.uint8)
+    _recolor(lut, *recolor_args)
+    if replace_colors:
+        _replace_color(lut, *replace_colors)
+    lut = _pixels_u32(lut)
+    lut.flags.writeable = False
+    return lut
+
+
+def _recolored_rgba(img, recolor_args, replace_colors=None):
+    """Convert image to RGBA array with _recolor and replace_colors applied
+    
+    Paletted images are recolored through a 256-entry RGBA lookup table
+    built from their palette, then expanded with a single gather.
+    """
+    palette = img.getpalette() if img.mode == 'P' else None
+    if palette:
+        lut = _palette_lut(bytes(palette), img.info.get('transparency'), recolor_args, replace_colors)
+        # Gather whole pixels as uint32 keyed by palette index
+        idx = np.asarray(img)
+        return np.take(lut, idx).view(np.uint8).reshape(idx.shape + (4,))
+    arr = _recolor(np.array(img if img.mode == 'RGBA' else img.convert('RGBA')), *recolor_args)
+    if replace_colors:
+        _replace_color(arr, *replace_colors)
+    return arr
+
+
+def _recolor_frame(img, shadow, colors, keep_sel, p2p3, shadow_in_main, replace_colors=None):
+    """Make frame transparent, merge shadow and apply palette fix, returns RGBA array"""
+    colors = tuple(colors)
+    main_args = (colors, keep_sel, p2p3, 'main_shadow' if shadow_in_main else 'main')
+    
+    if shadow and not shadow_in_main:
+        arr = _recolored_rgba(img, main_args)
+        shadow_arr = _recolored_rgba(shadow, (colors, keep_sel, p2p3, 'shadow'))
+        arr = np.array(Image.alpha_composite(_rgba_image(shadow_arr), _rgba_image(arr)))
+        if replace_colors:
+            _replace_color(arr, *replace_colors)
+        return arr
+    
+    # Without a shadow to merge the palette fix goes into the lookup table
+    return _recolored_rgba(img, main_args, replace_colors)
+
+
+def _replace_color(arr, old_color, new_color):
+    """Replace RGB color in RGBA array in place keeping alpha"""
+    arr[_color_mask(_rgb_keys(arr), old_color), :3] = new_color
+
+
+def _rgba_image(arr):
+    """Wrap RGBA array into PIL image without copying the pixel data"""
+    arr = np.ascontiguousarray(arr)
+    return Image.frombuffer('RGBA', (arr.shape[1], arr.shape[0]), arr, 'raw', 'RGBA', 0, 1)
+
+
+def _frame_bbox(frame):
+    """Get bounding box of non-transparent pixels, None if frame is empty"""
+    if frame.mode != 'RGBA':
+        return frame.getbbox()
+    alpha = np.asarray(frame.getchannel('A'))
+    rows = np.flatnonzero(alpha.any(axis=1))
+    if not rows.size:
+        return None
+    cols = np.flatnonzero(alpha.any(axis=0))
+    return (int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1)
+
+
+def _def_palette_colors(def_wrapper, replace_palette):
+    """Get shadow colors and (old, new) palette fix colors of a DEF, once per DEF"""
+    palette = def_wrapper.def_palette
+    if not palette or len(palette) <= 7:
+        return None, None
+    replace_colors = (palette[255], palette[5]) if replace_palette and len(palette) > 255 else None
+    return palette[:8], replace_colors
+
+
+def _def_webp_frame(def_wrapper, group_idx, pic_idx, colors, replace_colors, keep_sel, p2p3, config):
+    """Extract DEF frame with shadow merged and palette fixes applied"""
+    img, shadow = def_wrapper.extract_bmp(group_idx, pic_idx, bmp_spec=not config.shadow_in_main)
+    
+    # Process both images
+    if colors:
+        arr = _recolor_frame(img, shadow, colors, keep_sel, p2p3, config.shadow_in_main, replace_colors)
+        return _rgba_image(arr)
+    if img.mode == 'P':
+        return img.convert('RGBA')
+    return img
+
+
+def _union_bbox_crop(frames):
+    """Crop all frames to the union of their bounding boxes"""
+    bboxes = [bbox for bbox in map(_frame_bbox, frames) if bbox]
+    if not bboxes:
+        return frames
+    min_x, min_y, max_x, max_y = (min(b[0] for b in bboxes), min(b[1] for b in bboxes),
+                                  max(b[2] for b in bboxes), max(b[3] for b in bboxes))
+    return [frame.crop((min_x, min_y, max_x, max_y)) for frame in frames]
+
+
 def process_webp_group(def_name, def_type, group_id, group_count, frames_data, archive_path, output_dir, config):
     """Process a group of frames and save as WebP"""
-    from PIL import Image
-    
     # Get object name for filename prefix
     obj_name = get_name(def_name, archive_path, config.prefer_hota_names)
     filename_prefix = obj_name if obj_name else def_name
@@ -481,8 +696,7 @@ def process_webp_group(def_name, def_type, group_id, group_count, frames_data, a
     if group_count == 1:
         webp_name = f'{filename_prefix}.webp'
     else:
-        type_map = {'2': 0x42, '3': 0x43, '4': 0x44, '9': 0x49}
-        type_of_def = type_map.get(def_type, 0x43)
+        type_of_def = _TYPE_STR_TO_HEX.get(def_type, 0x43)
         creature_name = obj_name if obj_name else ''
         group_name = get_group_name(group_id, type_of_def, creature_name)
         if group_name.startswith('Group '):
@@ -496,41 +710,20 @@ def process_webp_group(def_name, def_type, group_id, group_count, frames_data, a
     # Crop frames if enabled
     if config.crop_frames and def_type not in config.no_crop_types:
         if config.individual_crop:
-            min_x, min_y, max_x, max_y = float('inf'), float('inf'), 0, 0
-            for frame in frames:
-                bbox = frame.getbbox()
-                if bbox:
-                    min_x = min(min_x, bbox[0])
-                    min_y = min(min_y, bbox[1])
-                    max_x = max(max_x, bbox[2])
-                    max_y = max(max_y, bbox[3])
-            if min_x < float('inf'):
-                frames = [frame.crop((min_x, min_y, max_x, max_y)) for frame in frames]
+            frames = _union_bbox_crop(frames)
         else:
             crop_key = def_type
             if def_type == '4':
-                name_result = get_name(def_name, archive_path, config.prefer_hota_names)
-                if 'Airship' in str(name_result):
+                if 'Airship' in str(obj_name):
                     crop_key = '4Airship'
-                elif 'Boat' in str(name_result):
+                elif 'Boat' in str(obj_name):
                     crop_key = '4Boat'
             
-            config = _load_def_config()
-            crop_bounds = config.get('cropBounds', {})
-            if crop_key in crop_bounds:
-                bounds = crop_bounds[crop_key]
+            if crop_key in _CROP_BOUNDS:
+                bounds = _CROP_BOUNDS[crop_key]
                 frames = [frame.crop(bounds) for frame in frames]
             else:
-                min_x, min_y, max_x, max_y = float('inf'), float('inf'), 0, 0
-                for frame in frames:
-                    bbox = frame.getbbox()
-                    if bbox:
-                        min_x = min(min_x, bbox[0])
-                        min_y = min(min_y, bbox[1])
-                        max_x = max(max_x, bbox[2])
-                        max_y = max(max_y, bbox[3])
-                if min_x < float('inf'):
-                    frames = [frame.crop((min_x, min_y, max_x, max_y)) for frame in frames]
+                frames = _union_bbox_crop(frames)
     
     # Calculate durations
     durations = get_frame_durations(frame_names, def_type, group_id, def_name)
@@ -549,14 +742,141 @@ def process_webp_group(def_name, def_type, group_id, group_count, frames_data, a
     print(f'Created WebP: {webp_name} ({len(frames)} frames)')
 
 
+def _process_webp_group_task(task):
+    """Run process_webp_group in a worker process, returns its printed output"""
+    def_name, def_type, group_id, group_count, packed_frames, archive_path, output_dir, config = task
+    # PIL images are sent as raw bytes, rebuild them here
+    frames_data = [{'image': Image.frombuffer(mode, size, data, 'raw', mode, 0, 1), 'name': name} for mode, size, data, name in packed_frames]
+    out = StringIO()
+    with redirect_stdout(out):
+        process_webp_group(def_name, def_type, group_id, group_count, frames_data, archive_path, output_dir, config)
+    return out.getvalue()
+
+
+def _run_webp_groups(executor, tasks):
+    """Encode queued WebP groups in parallel, printing output in queue order"""
+    if executor is None or len(tasks) < 2:
+        for task in tasks:
+            process_webp_group(*task)
+    else:
+        packed_tasks = []
+        for def_name, def_type, group_id, group_count, frames_data, archive_path, output_dir, config in tasks:
+            packed_frames = [(f['image'].mode, f['image'].size, f['image'].tobytes(), f['name']) for f in frames_data]
+            packed_tasks.append((def_name, def_type, group_id, group_count, packed_frames, archive_path, output_dir, config))
+        for output in executor.map(_process_webp_group_task, packed_tasks):
+            print(output, end='')
+    tasks.clear()
+
+
+def _process_archive_def(task):
+    """Save groups of one archive DEF as WebP, returns its printed output"""
+    archive_path, name, def_data, lod_dir, config = task
+    out = StringIO()
+    with redirect_stdout(out):
+        try:
+            def_wrapper = TRSDefWrapper(def_data)
+            def_name = Path(name).stem
+            def_dir = lod_dir / def_name
+            def_dir.mkdir(parents=True, exist_ok=True)
+            
+            # Map TypeOfDef to string for duration logic
+            def_type = _TYPE_HEX_TO_STR.get(def_wrapper.header.TypeOfDef, 'unknown')
+            
+            # Check if palette replacement is needed
+            replace_palette = needs_palette_255_fix(def_name, archive_path, config.prefer_hota_names)
+            keep_sel = keeps_selection_palette(def_name)
+            p2p3 = uses_hota_shadow_p2p3(def_name, archive_path, config.prefer_hota_names)
+            colors, replace_colors = _def_palette_colors(def_wrapper, replace_palette)
+            
+            # WebP names are built in process_webp_group, it only needs the group count
+            groups = def_wrapper.groups
+            group_count = len(groups)
+            tasks = []
+            for group_idx, group in enumerate(groups):
+                if group.ItemsCount == 0:
+                    continue
+                
+                # Extract frames
+                frames_data = []
+                for pic_idx in range(group.ItemsCount):
+                    try:
+                        img = _def_webp_frame(def_wrapper, group_idx, pic_idx, colors, replace_colors, keep_sel, p2p3, config)
+                        frames_data.append({'image': img, 'name': def_wrapper.get_pic_name(group_idx, pic_idx)})
+                    except Exception as e:
+                        print(f'Error extracting frame {pic_idx} from group {group_idx} in {name}: {e}')
+                
+                if frames_data:
+                    tasks.append((def_name, def_type, group.GroupNum, group_count, frames_data, archive_path, def_dir, config))
+            
+            _run_webp_groups(None, tasks)
+        
+        except Exception as e:
+            print(f'Error processing {name}: {e}')
+    return out.getvalue()
+
+
+def _archive_def_key(def_data, def_name, archive_path, config):
+    """Key of DEF content plus every name based setting that changes its WebP output"""
+    prefer_hota = config.prefer_hota_names
+    return (hashlib.blake2b(def_data, digest_size=16).digest(),
+            get_name(def_name, archive_path, prefer_hota),
+            needs_palette_255_fix(def_name, archive_path, prefer_hota),
+            keeps_selection_palette(def_name),
+            uses_hota_shadow_p2p3(def_name, archive_path, prefer_hota),
+            isAdvMapCreature(def_name))
+
+
+def _copy_archive_def(src_name, dst_name, lod_dir, obj_name):
+    """Copy WebP output of an identical DEF, returns its printed output"""
+    src_prefix = obj_name or src_name
+    dst_prefix = obj_name or dst_name
+    src_dir = lod_dir / src_name
+    dst_dir = lod_dir / dst_name
+    dst_dir.mkdir(parents=True, exist_ok=True)
+    lines = []
+    for entry in sorted(os.scandir(src_dir), key=lambda e: e.name):
+        if entry.name.startswith(src_prefix) and entry.name.endswith('.webp'):
+            webp_name = dst_prefix + entry.name[len(src_prefix):]
+            shutil.copyfile(entry.path, dst_dir / webp_name)
+            lines.append(f'Copied WebP: {webp_name} (same as {entry.name})\n')
+    return ''.join(lines)
+
+
+def _pending_output(item):
+    """Printed output of a queued archive DEF: text, worker future or deferred copy"""
+    if isinstance(item, str):
+        return item
+    if callable(item):
+        return item()
+    return item.result()
+
+
+# A single DEF with fewer groups than this is encoded inline; starting worker
+# processes (each re-importing this module on spawn platforms) costs more
+_MIN_POOL_GROUPS = 4
+
+
+def _webp_executor(max_workers=None):
+    """Process pool for WebP encoding, None on a single core"""
+    cpu_count = os.cpu_count() or 1
+    if cpu_count == 1:
+        return None
+    return ProcessPoolExecutor(max_workers=min(max_workers or cpu_count, cpu_count))
+
+
 def extract_webp(archive_path, output_path, config):
     """Extract DEF files as animated WebP"""
-    try:
-        from PIL import Image
-    except ImportError:
+    if Image is None:
         print('Error: Pillow is required for WebP extraction')
         return 1
+    if np is None:
+        print('Error: NumPy is required for WebP extraction')
+        return 1
     
+    # Groups are independent, encode them on all cores; the pool is only
+    # started for inputs large enough to pay for its worker processes
+    executor = None
+    tasks = []
     try:
         if config.hdl_structure:
             # HDL structure mode
@@ -574,6 +894,7 @@ def extract_webp(archive_path, output_path, config):
             
             print(f'Found {len(hdl_files)} HDL files')
             Path(output_path).mkdir(parents=True, exist_ok=True)
+            executor = _webp_executor()
             
             for hdl_path in hdl_files:
                 def_name = hdl_path.stem
@@ -581,6 +902,8 @@ def extract_webp(archive_path, output_path, config):
                 output_dir.mkdir(parents=True, exist_ok=True)
                 
                 def_type, groups = parse_hdl(hdl_path)
+                keep_sel = keeps_selection_palette(def_name)
+                p2p3 = uses_hota_shadow_p2p3(def_name, '', config.prefer_hota_names)
                 
                 for group in groups:
                     if not group['frames']:
@@ -597,67 +920,18 @@ def extract_webp(archive_path, output_path, config):
                         # Get palette from image
                         palette = img.getpalette()
                         if palette:
-                            transparent = tuple(palette[0:3])
-                            edge = tuple(palette[3:6])
-                            body_two = tuple(palette[6:9])
-                            edge_two = tuple(palette[9:12])
-                            body = tuple(palette[12:15])
-                            selection = tuple(palette[15:18])
-                            body_sel = tuple(palette[18:21])
-                            edge_sel = tuple(palette[21:24])
+                            colors = [tuple(palette[i:i + 3]) for i in range(0, 24, 3)]
                         else:
-                            transparent = (255, 255, 0)
-                            edge = body = body_two = edge_two = selection = body_sel = edge_sel = (0, 0, 0)
+                            colors = [(255, 255, 0)] + [(0, 0, 0)] * 7
                         
-                        # Convert to RGBA
-                        if img.mode == 'P':
-                            img = img.convert('RGBA')
-                        if shadow and shadow.mode == 'P':
-                            shadow = shadow.convert('RGBA')
-                        
-                        # Process main image
-                        img_data = img.load()
-                        w, h = img.size
-                        for y in range(h):
-                            for x in range(w):
-                                pixel = img_data[x, y][:3]
-                                if pixel == transparent:
-                                    img_data[x, y] = (0, 0, 0, 0)
-                        
-                        # Process shadow
-                        if config.shadow_in_main:
-                            # Process main image as if it contains shadows
-                            keep_sel = keeps_selection_palette(def_name)
-                            for y in range(h):
-                                for x in range(w):
-                                    pixel = img_data[x, y][:3]
-                                    if pixel == transparent or (pixel == selection and not keep_sel):
-                                        img_data[x, y] = (0, 0, 0, 0)
-                                    elif pixel == edge or pixel == edge_sel or (pixel == edge_two and uses_hota_shadow_p2p3(def_name, '', config.prefer_hota_names)):
-                                        img_data[x, y] = (0, 0, 0, 127)
-                                    elif pixel == body or pixel == body_sel or (pixel == body_two and uses_hota_shadow_p2p3(def_name, '', config.prefer_hota_names)):
-                                        img_data[x, y] = (0, 0, 0, 191)
-                        elif shadow:
-                            shadow_data = shadow.load()
-                            keep_sel = keeps_selection_palette(def_name)
-                            for y in range(h):
-                                for x in range(w):
-                                    pixel = shadow_data[x, y][:3]
-                                    if pixel == transparent or (pixel == selection and not keep_sel):
-                                        shadow_data[x, y] = (0, 0, 0, 0)
-                                    elif pixel == edge or pixel == edge_sel or (pixel == edge_two and uses_hota_shadow_p2p3(def_name, '', config.prefer_hota_names)):
-                                        shadow_data[x, y] = (0, 0, 0, 127)
-                                    elif pixel == body or pixel == body_sel or (pixel == body_two and uses_hota_shadow_p2p3(def_name, '', config.prefer_hota_names)):
-                                        shadow_data[x, y] = (0, 0, 0, 191)
-                                    else:
-                                        shadow_data[x, y] = (0, 0, 0, 0)
-                            
-                            img = Image.alpha_composite(shadow, img)
+                        img = _rgba_image(_recolor_frame(img, shadow, colors, keep_sel, p2p3, config.shadow_in_main))
                         
                         frames_data.append({'image': img, 'name': frame_path})
                     
                     if frames_data:
-                        process_webp_group(def_name, def_type, group['group_id'], len(groups), frames_data, '', output_dir, config)
+                        tasks.append((def_name, def_type, group['group_id'], len(groups), frames_data, '', output_dir, config))
+                
+                _run_webp_groups(executor, tasks)
             return 0
         
         if Path(archive_path).suffix.lower() == '.def':
@@ -672,118 +946,36 @@ def extract_webp(archive_path, output_path, config):
             def_dir.mkdir(parents=True, exist_ok=True)
             
             # Map TypeOfDef to string for duration logic
-            type_map = {0x42: '2', 0x43: '3', 0x44: '4', 0x49: '9'}
-            def_type = type_map.get(def_wrapper.header.TypeOfDef, 'unknown')
+            def_type = _TYPE_HEX_TO_STR.get(def_wrapper.header.TypeOfDef, 'unknown')
             
             # Check if palette replacement is needed
             replace_palette = needs_palette_255_fix(def_name, archive_path, config.prefer_hota_names)
+            keep_sel = keeps_selection_palette(def_name)
+            p2p3 = uses_hota_shadow_p2p3(def_name, archive_path, config.prefer_hota_names)
+            colors, replace_colors = _def_palette_colors(def_wrapper, replace_palette)
             
-            for group_idx, group in enumerate(def_wrapper.groups):
+            # WebP names are built in process_webp_group, it only needs the group count
+            groups = def_wrapper.groups
+            group_count = len(groups)
+            for group_idx, group in enumerate(groups):
                 if group.ItemsCount == 0:
                     continue
                 
-                # Get object name for filename prefix
-                obj_name = get_name(def_name, archive_path, config.prefer_hota_names)
-                filename_prefix = obj_name if obj_name else def_name
-                
-                # Get group name
-                if len(def_wrapper.groups) == 1:
-                    webp_name = f'{filename_prefix}.webp'
-                else:
-                    creature_name = obj_name if obj_name else ''
-                    group_name = get_group_name(group.GroupNum, def_wrapper.header.TypeOfDef, creature_name)
-                    if group_name.startswith('Group '):
-                        webp_name = f'{filename_prefix}_{group.GroupNum}.webp'
-                    else:
-                        webp_name = f'{filename_prefix} {group_name}.webp'
-                
                 # Extract frames
                 frames_data = []
                 for pic_idx in range(group.ItemsCount):
                     try:
-                        img, shadow = def_wrapper.extract_bmp(group_idx, pic_idx, bmp_spec=not config.shadow_in_main)
-                        
-                        # Process both images
-                        palette = def_wrapper.def_palette
-                        if palette and len(palette) > 7:
-                            # Get shadow colors from palette
-                            transparent = palette[0]
-                            edge = palette[1]
-                            body_two = palette[2]
-                            edge_two = palette[3]
-                            body = palette[4]
-                            selection = palette[5]
-                            body_sel = palette[6]
-                            edge_sel = palette[7]
-                            
-                            # Process main image
-                            if img.mode == 'P':
-                                img = img.convert('RGBA')
-                            
-                            img_data = img.load()
-                            w, h = img.size
-                            for y in range(h):
-                                for x in range(w):
-                                    pixel = img_data[x, y][:3]
-                                    if pixel == transparent:
-                                        img_data[x, y] = (0, 0, 0, 0)
-                            
-                            # Process shadow image
-                            if shadow and shadow.mode == 'P':
-                                shadow = shadow.convert('RGBA')
-                                shadow_data = shadow.load()
-                            else:
-                                shadow_data = None
-                            
-                            if config.shadow_in_main:
-                                # Process main image as if it contains shadows
-                                keep_sel = keeps_selection_palette(def_name)
-                                for y in range(h):
-                                    for x in range(w):
-                                        pixel = img_data[x, y][:3]
-                                        if pixel == transparent or (pixel == selection and not keep_sel):
-                                            img_data[x, y] = (0, 0, 0, 0)
-                                        elif pixel == edge or pixel == edge_sel or (pixel == edge_two and uses_hota_shadow_p2p3(def_name, archive_path, config.prefer_hota_names)):
-                                            img_data[x, y] = (0, 0, 0, 127)
-                                        elif pixel == body or pixel == body_sel or (pixel == body_two and uses_hota_shadow_p2p3(def_name, archive_path, config.prefer_hota_names)):
-                                            img_data[x, y] = (0, 0, 0, 191)
-                            elif shadow_data:
-                                for y in range(h):
-                                    for x in range(w):
-                                        pixel = shadow_data[x, y][:3]
-                                        keep_sel = keeps_selection_palette(def_name)
-                                        if pixel == transparent or (pixel == selection and not keep_sel):
-                                            shadow_data[x, y] = (0, 0, 0, 0)
-                                        elif pixel == edge or pixel == edge_sel or (pixel == edge_two and uses_hota_shadow_p2p3(def_name, archive_path, config.prefer_hota_names)):
-                                            shadow_data[x, y] = (0, 0, 0, 127)
-                                        elif pixel == body or pixel == body_sel or (pixel == body_two and uses_hota_shadow_p2p3(def_name, archive_path, config.prefer_hota_names)):
-                                            shadow_data[x, y] = (0, 0, 0, 191)
-                                        else:
-                                            shadow_data[x, y] = (0, 0, 0, 0)
-                                
-                                img = Image.alpha_composite(shadow, img)
-                        else:
-                            if img.mode == 'P':
-                                img = img.convert('RGBA')
-                        
-                        # Apply palette replacement if needed
-                        if replace_palette:
-                            palette = def_wrapper.def_palette
-                            if palette and len(palette) > 255:
-                                color_255 = palette[255]
-                                color_5 = palette[5]
-                                img_data = img.load()
-                                for y in range(img.size[1]):
-                                    for x in range(img.size[0]):
-                                        if img_data[x, y][:3] == color_255:
-                                            img_data[x, y] = color_5 + (img_data[x, y][3],)
-                        
+                        img = _def_webp_frame(def_wrapper, group_idx, pic_idx, colors, replace_colors, keep_sel, p2p3, config)
                         frames_data.append({'image': img, 'name': def_wrapper.get_pic_name(group_idx, pic_idx)})
                     except Exception as e:
                         print(f'Error extracting frame {pic_idx} from group {group_idx}: {e}')
                 
                 if frames_data:
-                    process_webp_group(def_name, def_type, group.GroupNum, len(def_wrapper.groups), frames_data, archive_path, def_dir, config)
+                    tasks.append((def_name, def_type, group.GroupNum, group_count, frames_data, archive_path, def_dir, config))
+            
+            if len(tasks) >= _MIN_POOL_GROUPS:
+                executor = _webp_executor(len(tasks))
+            _run_webp_groups(executor, tasks)
         
         else:
             archive = rs_load_mm_archive(archive_path)
@@ -794,136 +986,37 @@ def extract_webp(archive_path, output_path, config):
             lod_dir = Path(output_path) / lod_name
             lod_dir.mkdir(parents=True, exist_ok=True)
             
+            # Each DEF is decoded and encoded in a worker; the main process only reads the archive
+            executor = _webp_executor()
+            window = 4 * (os.cpu_count() or 1)
+            pending = deque()
+            seen = {}
             def_count = 0
-            for i in range(archive.count):
-                name = archive.get_file_name(i).rstrip('\x00')
-                if Path(name).suffix.lower() != '.def':
-                    continue
-                
+            for i, name in _def_entries(archive):
                 def_count += 1
                 try:
                     def_data = archive.extract_array(i)
-                    def_wrapper = TRSDefWrapper(bytes(def_data))
-                    def_name = Path(name).stem
-                    def_dir = lod_dir / def_name
-                    def_dir.mkdir(parents=True, exist_ok=True)
-                    
-                    # Map TypeOfDef to string for duration logic
-                    type_map = {0x42: '2', 0x44: '4', 0x49: '9'}
-                    def_type = type_map.get(def_wrapper.header.TypeOfDef, 'unknown')
-                    
-                    # Check if palette replacement is needed
-                    replace_palette = needs_palette_255_fix(def_name, archive_path, config.prefer_hota_names)
-                    
-                    for group_idx, group in enumerate(def_wrapper.groups):
-                        if group.ItemsCount == 0:
-                            continue
-                        
-                        # Get object name for filename prefix
-                        obj_name = get_name(def_name, archive_path, config.prefer_hota_names)
-                        filename_prefix = obj_name if obj_name else def_name
-                        
-                        # Get group name
-                        if len(def_wrapper.groups) == 1:
-                            webp_name = f'{filename_prefix}.webp'
-                        else:
-                            creature_name = obj_name if obj_name else ''
-                            group_name = get_group_name(group.GroupNum, def_wrapper.header.TypeOfDef, creature_name)
-                            if group_name.startswith('Group '):
-                                webp_name = f'{filename_prefix}_{group.GroupNum}.webp'
-                            else:
-                                webp_name = f'{filename_prefix} {group_name}.webp'
-                        
-                        # Extract frames
-                        frames_data = []
-                        for pic_idx in range(group.ItemsCount):
-                            try:
-                                img, shadow = def_wrapper.extract_bmp(group_idx, pic_idx, bmp_spec=not config.shadow_in_main)
-                                
-                                # Process both images
-                                palette = def_wrapper.def_palette
-                                if palette and len(palette) > 7:
-                                    # Get shadow colors from palette
-                                    transparent = palette[0]
-                                    edge = palette[1]
-                                    body_two = palette[2]
-                                    edge_two = palette[3]
-                                    body = palette[4]
-                                    selection = palette[5]
-                                    body_sel = palette[6]
-                                    edge_sel = palette[7]
-                                    
-                                    # Process main image
-                                    if img.mode == 'P':
-                                        img = img.convert('RGBA')
-                                    
-                                    img_data = img.load()
-                                    w, h = img.size
-                                    for y in range(h):
-                                        for x in range(w):
-                                            pixel = img_data[x, y][:3]
-                                            if pixel == transparent:
-                                                img_data[x, y] = (0, 0, 0, 0)
-                                    
-                                    # Process shadow image
-                                    if shadow and shadow.mode == 'P':
-                                        shadow = shadow.convert('RGBA')
-                                        shadow_data = shadow.load()
-                                    else:
-                                        shadow_data = None
-                                    
-                                    if config.shadow_in_main:
-                                        # Process main image as if it contains shadows
-                                        keep_sel = keeps_selection_palette(def_name)
-                                        for y in range(h):
-                                            for x in range(w):
-                                                pixel = img_data[x, y][:3]
-                                                if pixel == transparent or (pixel == selection and not keep_sel):
-                                                    img_data[x, y] = (0, 0, 0, 0)
-                                                elif pixel == edge or pixel == edge_sel or (pixel == edge_two and uses_hota_shadow_p2p3(def_name, archive_path, config.prefer_hota_names)):
-                                                    img_data[x, y] = (0, 0, 0, 127)
-                                                elif pixel == body or pixel == body_sel or (pixel == body_two and uses_hota_shadow_p2p3(def_name, archive_path, config.prefer_hota_names)):
-                                                    img_data[x, y] = (0, 0, 0, 191)
-                                    elif shadow_data:
-                                        for y in range(h):
-                                            for x in range(w):
-                                                pixel = shadow_data[x, y][:3]
-                                                keep_sel = keeps_selection_palette(def_name)
-                                                if pixel == transparent or (pixel == selection and not keep_sel):
-                                                    shadow_data[x, y] = (0, 0, 0, 0)
-                                                elif pixel == edge or pixel == edge_sel or (pixel == edge_two and uses_hota_shadow_p2p3(def_name, archive_path, config.prefer_hota_names)):
-                                                    shadow_data[x, y] = (0, 0, 0, 127)
-                                                elif pixel == body or pixel == body_sel or (pixel == body_two and uses_hota_shadow_p2p3(def_name, archive_path, config.prefer_hota_names)):
-                                                    shadow_data[x, y] = (0, 0, 0, 191)
-                                                else:
-                                                    shadow_data[x, y] = (0, 0, 0, 0)
-                                        
-                                        img = Image.alpha_composite(shadow, img)
-                                else:
-                                    if img.mode == 'P':
-                                        img = img.convert('RGBA')
-                                
-                                # Apply palette replacement if needed
-                                if replace_palette:
-                                    palette = def_wrapper.def_palette
-                                    if palette and len(palette) > 255:
-                                        color_255 = palette[255]
-                                        color_5 = palette[5]
-                                        img_data = img.load()
-                                        for y in range(img.size[1]):
-                                            for x in range(img.size[0]):
-                                                if img_data[x, y][:3] == color_255:
-                                                    img_data[x, y] = color_5 + (img_data[x, y][3],)
-                                
-                                frames_data.append({'image': img, 'name': def_wrapper.get_pic_name(group_idx, pic_idx)})
-                            except Exception as e:
-                                print(f'Error extracting frame {pic_idx} from group {group_idx} in {name}: {e}')
-                        
-                        if frames_data:
-                            process_webp_group(def_name, def_type, group.GroupNum, len(def_wrapper.groups), frames_data, archive_path, def_dir, config)
-                
                 except Exception as e:
-                    print(f'Error processing {name}: {e}')
+                    pending.append(f'Error processing {name}: {e}\n')
+                    continue
+                
+                # Identical DEFs are copied from the first one's output instead of re-encoded
+                def_name = Path(name).stem
+                key = _archive_def_key(def_data, def_name, archive_path, config)
+                if key in seen:
+                    copy_args = (seen[key], def_name, lod_dir, key[1])
+                    # Queued copies run after the first DEF's output is printed, so it is complete
+                    pending.append(partial(_copy_archive_def, *copy_args) if executor else _copy_archive_def(*copy_args))
+                else:
+                    seen[key] = def_name
+                    task = (archive_path, name, def_data, lod_dir, config)
+                    pending.append(executor.submit(_process_archive_def, task) if executor else _process_archive_def(task))
+                # Print finished DEFs in archive order, keeping a bounded window in flight
+                while pending and (len(pending) > window or not hasattr(pending[0], 'done') or pending[0].done()):
+                    print(_pending_output(pending.popleft()), end='')
+            
+            while pending:
+                print(_pending_output(pending.popleft()), end='')
             
             if def_count == 0:
                 print('No DEF files found in archive')
@@ -933,6 +1026,9 @@ def extract_webp(archive_path, output_path, config):
     except ERSLodException as e:
         print(f'Error: {e}')
         return 1
+    finally:
+        if executor:
+            executor.shutdown()
     return 0
 
 
@@ -967,25 +1063,23 @@ def extract_def_tool(archive_path, output_path, config):
             Path(output_path).mkdir(parents=True, exist_ok=True)
             
             def_count = 0
-            for i in range(archive.count):
-                name = archive.get_file_name(i)
-                name = name.rstrip('\x00')  # Remove null terminators
-                print(f'Found file: {name}')
-                if Path(name).suffix.lower() != '.def':
-                    continue
-                
+            log = []
+            for i, name in _def_entries(archive):
                 def_count += 1
                 try:
                     extract_dir = Path(output_path) / Path(name).stem
                     extract_dir.mkdir(parents=True, exist_ok=True)
                     
                     def_data = archive.extract_array(i)
-                    def_wrapper = TRSDefWrapper(bytes(def_data))
+                    def_wrapper = TRSDefWrapper(def_data)
                     output_file = extract_dir / Path(name).with_suffix('.hdl').name
                     def_wrapper.extract_def_tool_list(str(output_file), config.extract_with_shadow, config.extract_in_24_bits)
-                    print(f'Extracted DEF: {name}')
+                    log.append(f'Extracted DEF: {name}')
                 except Exception as e:
-                    print(f'Error extracting {name}: {e}')
+                    log.append(f'Error extracting {name}: {e}')
+                if len(log) >= _LOG_BATCH:
+                    _write_lines(log)
+            _write_lines(log)
             
             if def_count == 0:
                 print('No DEF files found in archive')
@@ -8,23 +8,23 @@ Checks if Efreeti sounds are properly configured and copied.
 import sys
 from pathlib import Path
 
-try:
-    import json5
-except ImportError:
-    print("Error: json5 library required. Install with: pip install json5")
-    sys.exit(1)
+from sound_utils import iter_files, load_json5_cached
 
 def check_efreeti(creatures_json: str, original_sound_dir: str, renamed_sound_dir: str):
     """Check Efreeti sound configuration and files."""
     
     # Load creatures.json
     try:
-        with open(creatures_json, 'r', encoding='utf-8') as f:
-            creatures_data = json5.load(f)
+        creatures_data = load_json5_cached(creatures_json)
     except FileNotFoundError:
         print(f"Error: {creatures_json} not found")
         return
     
+    # Index original WAVs by upper-case stem once, first match wins
+    wav_index = {}
+    for entry in iter_files(original_sound_dir, '.wav'):
+        wav_index.setdefault(entry.name[:-4].upper(), entry.path)
+    
     # Find Efreeti entries
     print("Searching for Efreeti in creatures.json...\n")
     
@@ -44,12 +44,7 @@ def check_efreeti(creatures_json: str, original_sound_dir: str, renamed_sound_di
                     print(f"    {action}: {filename}")
                     
                     # Check if file exists in original location
-                    original_path = Path(original_sound_dir)
-                    found_original = None
-                    for wav_file in original_path.rglob("*.wav"):
-                        if wav_file.stem.upper() == filename.upper():
-                            found_original = wav_file
-                            break
+                    found_original = wav_index.get(filename.upper())
                     
                     if found_original:
                         print(f"      ✓ Found in original: {found_original}")
@@ -5,9 +5,16 @@ Check Missing Conversion
 Checks which WAV files exist in source but not in WebM output.
 """
 
+import os
 import sys
 from pathlib import Path
 
+from sound_utils import iter_files
+
+def _rel_key(path: str, root: str) -> str:
+    """Relative path without extension, case-folded where the OS is."""
+    return os.path.normcase(os.path.splitext(os.path.relpath(path, root))[0])
+
 def check_missing(source_dir: str, output_dir: str):
     """Check which files weren't converted."""
     
@@ -22,17 +29,17 @@ def check_missing(source_dir: str, output_dir: str):
         print(f"Error: Output directory {output_dir} does not exist")
         return
     
-    # Get all WAV files
-    wav_files = {f.relative_to(source_path): f for f in source_path.rglob("*.wav")}
+    # Get all WAV files, keyed by relative path without extension
+    wav_files = {_rel_key(e.path, source_dir): e.path for e in iter_files(source_dir, '.wav')}
     
     # Get all WebM files
-    webm_files = {f.relative_to(output_path).with_suffix('.wav'): f for f in output_path.rglob("*.webm")}
+    webm_files = {_rel_key(e.path, output_dir) for e in iter_files(output_dir, '.webm')}
     
     # Find missing
     missing = []
-    for rel_path, wav_file in wav_files.items():
-        if rel_path not in webm_files:
-            missing.append((rel_path, wav_file))
+    for key, wav_file in wav_files.items():
+        if key not in webm_files:
+            missing.append((os.path.relpath(wav_file, source_dir), wav_file))
     
     print(f"Total WAV files: {len(wav_files)}")
     print(f"Total WebM files: {len(webm_files)}")
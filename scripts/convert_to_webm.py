@@ -3,11 +3,79 @@
 Convert to WebM
 
 Converts WAV files to WebM format using ffmpeg.
+Uses PyAV (pip install av) when available to avoid spawning ffmpeg per file.
 """
 
+import os
 import subprocess
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from typing import Optional
+
+from sound_utils import iter_files
+
+# Optional: encode in-process with PyAV instead of spawning ffmpeg per file
+try:
+    import av
+except ImportError:
+    av = None
+
+def _encode_with_av(wav_file: Path, target_file: Path):
+    """Encode WAV to Opus WebM in-process using PyAV."""
+    with av.open(str(wav_file)) as src, av.open(str(target_file), 'w', format='webm') as dst:
+        in_stream = src.streams.audio[0]
+        # Opus only runs at 48 kHz; PyAV resamples frames to the encoder format
+        out_stream = dst.add_stream('libopus', rate=48000, layout=in_stream.layout.name)
+        for frame in src.decode(in_stream):
+            frame.pts = None
+            for packet in out_stream.encode(frame):
+                dst.mux(packet)
+        for packet in out_stream.encode(None):
+            dst.mux(packet)
+
+def _target_for(wav_file: Path, source_path: Path, output_path: Path) -> Path:
+    """Get WebM path for a WAV file, preserving directory structure."""
+    rel_path = wav_file.relative_to(source_path)
+    return output_path / rel_path.with_suffix('.webm')
+
+def _is_up_to_date(wav_file: Path, target_file: Path) -> bool:
+    """Check if target exists and is not older than the WAV."""
+    try:
+        return target_file.stat().st_mtime >= wav_file.stat().st_mtime
+    except FileNotFoundError:
+        return False
+
+def _convert_one(wav_file: Path, source_path: Path, output_path: Path) -> Optional[str]:
+    """Convert a single WAV file, returns the encoder's error if it failed."""
+    target_file = _target_for(wav_file, source_path, output_path)
+    
+    # Create target directory
+    target_file.parent.mkdir(parents=True, exist_ok=True)
+    
+    # Encode to a temp file so a failed run never leaves a "fresh" target behind
+    temp_file = target_file.with_name(target_file.name + '.part')
+    try:
+        if av is not None:
+            try:
+                _encode_with_av(wav_file, temp_file)
+            except Exception as e:
+                return f"{type(e).__name__}: {e}"
+        else:
+            # Convert using ffmpeg, one thread each since files run in parallel
+            result = subprocess.run(
+                ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-i', str(wav_file),
+                 '-threads', '1', '-f', 'webm', '-y', str(temp_file)],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                text=True
+            )
+            if result.returncode:
+                return result.stderr.strip() or f"ffmpeg exited with code {result.returncode}"
+        os.replace(temp_file, target_file)
+    finally:
+        temp_file.unlink(missing_ok=True)
+    return None
 
 def convert_to_webm(source_dir: str, output_dir: str):
     """Convert all WAV files to WebM format."""
@@ -20,41 +88,42 @@ def convert_to_webm(source_dir: str, output_dir: str):
         return
     
     # Find all WAV files recursively
-    wav_files = list(source_path.rglob("*.wav"))
-    print(f"Found {len(wav_files)} WAV files\n")
+    wav_files = [Path(e.path) for e in iter_files(source_dir, '.wav')]
+    print(f"Found {len(wav_files)} WAV files")
+    
+    # Skip files converted by a previous run
+    pending = [w for w in wav_files if not _is_up_to_date(w, _target_for(w, source_path, output_path))]
+    skipped = len(wav_files) - len(pending)
+    print(f"Skipping {skipped} up-to-date files\n")
+    wav_files = pending
     
     converted = 0
     failed = 0
     
-    for wav_file in wav_files:
-        # Preserve directory structure
-        rel_path = wav_file.relative_to(source_path)
-        target_file = output_path / rel_path.with_suffix('.webm')
-        
-        # Create target directory
-        target_file.parent.mkdir(parents=True, exist_ok=True)
-        
-        # Convert using ffmpeg
-        try:
-            subprocess.run(
-                ['ffmpeg', '-i', str(wav_file), '-y', str(target_file)],
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-                check=True
-            )
-            converted += 1
-            if converted % 10 == 0:
-                print(f"Converted {converted}/{len(wav_files)} files...")
-        except subprocess.CalledProcessError:
-            print(f"✗ Failed: {wav_file.name}")
-            failed += 1
-        except FileNotFoundError:
-            print("Error: ffmpeg not found. Please install ffmpeg and add to PATH")
-            return
+    # ffmpeg runs in its own process, so threads are enough to keep all cores busy
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        futures = {executor.submit(_convert_one, wav_file, source_path, output_path): wav_file
+                   for wav_file in wav_files}
+        for future in as_completed(futures):
+            try:
+                error = future.result()
+            except FileNotFoundError:
+                print("Error: ffmpeg not found. Please install ffmpeg and add to PATH")
+                executor.shutdown(wait=False, cancel_futures=True)
+                return
+            if error is None:
+                converted += 1
+                if converted % 10 == 0:
+                    print(f"Converted {converted}/{len(wav_files)} files...")
+            else:
+                # Printed here, not in the worker, so messages never interleave
+                print(f"✗ Failed: {futures[future].name}\n  {error}")
+                failed += 1
     
     print(f"\n{'='*60}")
     print(f"Conversion complete:")
     print(f"  Converted: {converted}")
+    print(f"  Skipped: {skipped}")
     print(f"  Failed: {failed}")
 
 def main():
@@ -5,10 +5,14 @@ Extract Missing Sounds
 Searches SND archives for missing sound files and extracts them to target directory.
 """
 
+import json
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+from sound_utils import LOG_BATCH, iter_files, temp_cache_path, write_file, write_json_atomic, write_lines
+
 # Add src directory to path for MMArchive imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
@@ -18,6 +22,81 @@ except ImportError:
     print("Error: MMArchiveCLI src modules not found. Ensure src/ directory exists.")
     sys.exit(1)
 
+def sound_key(filename: str) -> str:
+    """Normalize SND entry name to uppercase without wav extension."""
+    # Handle various formats: "FILEwav", "FILE.wav", "FILE"
+    name_upper = filename.replace('\x00', '').upper()
+    if name_upper.endswith('.WAV'):
+        return name_upper[:-4]
+    if name_upper.endswith('WAV'):
+        return name_upper[:-3]
+    return name_upper
+
+def build_snd_index(snd_root: str, cache_path: Path) -> dict:
+    """Map sound key to {archive: index} of every SND archive containing it.
+    
+    Entry names of each archive are cached in cache_path and reused while the
+    archive's mtime and size are unchanged, so later runs skip opening it.
+    """
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        cached = {}
+    
+    archives = {}
+    for entry in iter_files(snd_root, ".snd"):
+        stat = entry.stat()
+        stamp = [stat.st_mtime_ns, stat.st_size]
+        info = cached.get(entry.path)
+        if not info or info['stamp'] != stamp:
+            try:
+                snd = rs_load_mm_archive(entry.path)
+                names = [sound_key(snd.files.get_name(i).rstrip('\x00')) for i in range(snd.files.count)]
+            except Exception as e:
+                print(f"Error processing {entry.path}: {e}")
+                continue
+            info = {'stamp': stamp, 'names': names}
+        archives[entry.path] = info
+    
+    if archives != cached:
+        write_json_atomic(cache_path, archives)
+    
+    index = {}
+    for archive, info in archives.items():
+        for i, name in enumerate(info['names']):
+            locations = index.setdefault(name, {})
+            locations.setdefault(archive, i)
+    return index
+
+def plan_archive_opens(snd_index: dict, missing_files: set, exclude: set = frozenset()) -> dict:
+    """
+    Choose archives to extract missing sounds from, opening as few as possible.
+    
+    Greedy set cover: the archive holding the most still-unassigned names is
+    taken first, ties going to the earlier archive in sorted path order.
+    Archives in exclude are never chosen.
+    
+    Returns:
+        {archive: [(index, name), ...]} in the order archives were chosen
+    """
+    candidates = {}
+    for name in missing_files:
+        for archive, i in snd_index.get(name, {}).items():
+            if archive in exclude:
+                continue
+            candidates.setdefault(archive, {})[name] = i
+    candidates = dict(sorted(candidates.items()))
+    
+    plan = {}
+    remaining = set().union(*candidates.values()) if candidates else set()
+    while remaining:
+        archive = max(candidates, key=lambda a: len(candidates[a].keys() & remaining))
+        names = candidates.pop(archive).items()
+        plan[archive] = sorted((i, name) for name, i in names if name in remaining)
+        remaining.difference_update(name for name, _ in names)
+    return plan
+
 def load_missing_files(missing_txt_path: str) -> set:
     """Load list of missing files from text file."""
     try:
@@ -62,59 +141,58 @@ def extract_missing_sounds(snd_root: str, missing_txt: str, target_dir: str):
     found_files = {}
     not_found = set(missing_files)
     
-    # Find all .snd files recursively
-    snd_files = sorted(list(snd_path.rglob("*.snd")))
-    print(f"Searching {len(snd_files)} .snd archives...\n")
+    # Look up missing names in the entry index, grouped by archive. The index
+    # is cached in the temp directory, the SND tree is only read
+    snd_index = build_snd_index(snd_root, temp_cache_path('mm_snd_index', snd_root))
+    print(f"Indexed {len(snd_index)} sounds in .snd archives\n")
     
-    for snd_file in snd_files:
-        if not not_found:
-            break  # All files found
-        
+    # Open each chosen archive once and extract only the requested entries,
+    # printing results in batches. Files are written by a small thread pool.
+    # When an archive fails, the names still left are planned again against
+    # the archives not opened yet
+    log = []
+    write_pool = ThreadPoolExecutor(max_workers=4)
+    writes = []
+    opened = set()
+    plan = list(plan_archive_opens(snd_index, missing_files).items())
+    while plan:
+        snd_file, entries = plan.pop(0)
+        opened.add(snd_file)
         try:
             # Open SND file using MMArchive
-            snd = rs_load_mm_archive(str(snd_file))
+            snd = rs_load_mm_archive(snd_file)
             
-            if snd.files.count == 0:
-                continue
-            
-            # Check each file in archive
-            for i in range(snd.files.count):
-                if not not_found:
-                    break
-                
-                filename = snd.files.get_name(i).rstrip('\x00')
+            # Extract file data, all entries through one archive stream
+            file_datas = snd.extract_arrays([i for i, _ in entries])
+            for (i, name_no_ext), file_data in zip(entries, file_datas):
+                # Normalize output filename
+                output_name = name_no_ext + '.wav'
+                target_file = target_path / output_name
                 
-                # Normalize filename for comparison
-                clean_name = filename.replace('\x00', '')
+                writes.append((name_no_ext, target_file, write_pool.submit(write_file, target_file, file_data)))
                 
-                # Handle various formats: "FILEwav", "FILE.wav", "FILE"
-                name_upper = clean_name.upper()
-                if name_upper.endswith('.WAV'):
-                    name_no_ext = name_upper[:-4]
-                elif name_upper.endswith('WAV'):
-                    name_no_ext = name_upper[:-3]
-                else:
-                    name_no_ext = name_upper
-                
-                # Check if this is a missing file
-                if name_no_ext in not_found:
-                    # Extract file data
-                    file_data = snd.extract_array(i)
-                    
-                    # Normalize output filename
-                    output_name = name_no_ext + '.wav'
-                    target_file = target_path / output_name
-                    
-                    with open(target_file, 'wb') as f:
-                        f.write(file_data)
-                    
-                    found_files[name_no_ext] = str(snd_file)
-                    not_found.remove(name_no_ext)
-                    print(f"✓ Found {output_name} in {snd_file.name}")
+                found_files[name_no_ext] = snd_file
+                not_found.remove(name_no_ext)
+                log.append(f"✓ Found {output_name} in {os.path.basename(snd_file)}")
+                if len(log) >= LOG_BATCH:
+                    write_lines(log)
         
         except Exception as e:
-            print(f"Error processing {snd_file}: {e}")
-            continue
+            log.append(f"Error processing {snd_file}: {e}")
+            names_left = {name for _, name in entries if name not in found_files}
+            for _, planned in plan:
+                names_left.update(name for _, name in planned)
+            plan = list(plan_archive_opens(snd_index, names_left, opened).items())
+    
+    for name_no_ext, target_file, write in writes:
+        try:
+            write.result()
+        except OSError as e:
+            log.append(f"Error writing {target_file}: {e}")
+            del found_files[name_no_ext]
+            not_found.add(name_no_ext)
+    write_pool.shutdown()
+    write_lines(log)
     
     # Report results
     print(f"\n{'='*60}")
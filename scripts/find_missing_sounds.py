@@ -8,18 +8,13 @@ Reports creatures in creatures.json that are missing sound mappings.
 import json
 import sys
 
-try:
-    import json5
-except ImportError:
-    print("Error: json5 library required. Install with: pip install json5")
-    sys.exit(1)
+from sound_utils import load_json5_cached
 
 def find_missing_sounds(creatures_json_path: str):
     """Find creatures without sound mappings."""
     
     try:
-        with open(creatures_json_path, 'r', encoding='utf-8') as f:
-            creatures_data = json5.load(f)
+        creatures_data = load_json5_cached(creatures_json_path)
     except FileNotFoundError:
         print(f"Error: creatures.json not found at {creatures_json_path}")
         return
@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 """Fix Efreeti Sounds - Copy and convert only missing Efreeti files."""
 
+import os
 import subprocess
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 source_dir = Path("J:/Heroes/sound/01 RoE 1.0/Data/Heroes3_snd")
@@ -17,15 +19,28 @@ efreeti_sounds = {
     "EFRTWNCE": "Heroes3 - Efreeti - HurtSound.wav"
 }
 
+def convert(target_wav: Path) -> Path:
+    """Convert a copied WAV to WebM, printing ffmpeg's errors if it fails."""
+    target_webm = webm_dir / target_wav.name.replace('.wav', '.webm')
+    result = subprocess.run(['ffmpeg', '-hide_banner', '-loglevel', 'error', '-i', str(target_wav), '-y', str(target_webm)],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if result.returncode:
+        print(result.stderr, end='')
+        result.check_returncode()
+    return target_webm
+
 renamed_dir.mkdir(parents=True, exist_ok=True)
 webm_dir.mkdir(parents=True, exist_ok=True)
 
+# Case-insensitive index of source WAVs, built with one directory scan
+with os.scandir(source_dir) as it:
+    wav_index = {entry.name[:-4].upper(): Path(entry.path) for entry in it
+                 if entry.name.lower().endswith('.wav')}
+
+copied = []
+
 for source_name, target_name in efreeti_sounds.items():
-    source_file = None
-    for wav in source_dir.glob("*.wav"):
-        if wav.stem.upper() == source_name.upper():
-            source_file = wav
-            break
+    source_file = wav_index.get(source_name.upper())
     
     if not source_file:
         print(f"✗ Not found: {source_name}.wav")
@@ -34,10 +49,11 @@ for source_name, target_name in efreeti_sounds.items():
     target_wav = renamed_dir / target_name
     shutil.copy2(source_file, target_wav)
     print(f"✓ Copied: {target_name}")
-    
-    target_webm = webm_dir / target_name.replace('.wav', '.webm')
-    subprocess.run(['ffmpeg', '-i', str(target_wav), '-y', str(target_webm)],
-                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
-    print(f"✓ Converted: {target_webm.name}")
+    copied.append(target_wav)
+
+# ffmpeg runs in its own process, so threads overlap the per-file startup
+with ThreadPoolExecutor(max_workers=max(len(copied), 1)) as executor:
+    for target_webm in executor.map(convert, copied):
+        print(f"✓ Converted: {target_webm.name}")
 
 print("\nDone!")
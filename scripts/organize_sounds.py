@@ -6,22 +6,40 @@ Organizes sound files by faction and renames them with creature names.
 """
 
 import json
+import os
 import sys
 import shutil
 from pathlib import Path
 
-try:
-    import json5
-except ImportError:
-    print("Error: json5 library required. Install with: pip install json5")
-    sys.exit(1)
+from sound_utils import load_json5_cached, load_wav_index
+
+def link_or_copy(source_file: str, target_file: str) -> bool:
+    """Hardlink source to target, falling back to a copy across filesystems.
+    
+    Returns False without touching the target when it is already a link to
+    the source or a copy with the same size and mtime (copy2 keeps mtime).
+    """
+    try:
+        target_stat = os.stat(target_file)
+    except FileNotFoundError:
+        pass
+    else:
+        source_stat = os.stat(source_file)
+        if os.path.samestat(source_stat, target_stat) or (
+                source_stat.st_size == target_stat.st_size and source_stat.st_mtime_ns == target_stat.st_mtime_ns):
+            return False
+        os.unlink(target_file)
+    try:
+        os.link(source_file, target_file)
+    except OSError:
+        shutil.copy2(source_file, target_file)
+    return True
 
 def organize_sounds(creatures_json_path: str, sound_dir: str, output_dir: str):
     """Organize and rename sound files by faction."""
     
     try:
-        with open(creatures_json_path, 'r', encoding='utf-8') as f:
-            creatures_data = json5.load(f)
+        creatures_data = load_json5_cached(creatures_json_path)
     except FileNotFoundError:
         print(f"Error: creatures.json not found at {creatures_json_path}")
         return
@@ -31,12 +49,8 @@ def organize_sounds(creatures_json_path: str, sound_dir: str, output_dir: str):
         print(f"Error: Sound directory {sound_dir} does not exist")
         return
     
-    output_path = Path(output_dir)
-    
     # Build case-insensitive lookup of all wav files
-    all_wav_files = {}
-    for wav_file in sound_path.rglob("*.wav"):
-        all_wav_files[wav_file.stem.upper()] = wav_file
+    all_wav_files = load_wav_index(sound_dir)
     
     print(f"Found {len(all_wav_files)} WAV files\n")
     
@@ -52,7 +66,10 @@ def organize_sounds(creatures_json_path: str, sound_dir: str, output_dir: str):
     }
     
     copied_count = 0
+    up_to_date_count = 0
     missing_count = 0
+    # Faction directory paths as plain strings, joined once per faction
+    faction_dirs = {}
     
     for creature_key, creature_info in creatures_data.items():
         if not isinstance(creature_info, dict) or 'sounds' not in creature_info:
@@ -64,9 +81,11 @@ def organize_sounds(creatures_json_path: str, sound_dir: str, output_dir: str):
         # Extract faction name (remove "sod." or "hota." prefix)
         faction_name = faction.split('.')[-1] if '.' in faction else faction
         
-        # Create faction directory
-        faction_dir = output_path / faction_name
-        faction_dir.mkdir(parents=True, exist_ok=True)
+        # Create faction directory, once per faction
+        faction_dir = faction_dirs.get(faction_name)
+        if faction_dir is None:
+            faction_dir = faction_dirs[faction_name] = os.path.join(output_dir, faction_name)
+            os.makedirs(faction_dir, exist_ok=True)
         
         for action, filename in creature_info['sounds'].items():
             # Find source file (case-insensitive)
@@ -80,15 +99,18 @@ def organize_sounds(creatures_json_path: str, sound_dir: str, output_dir: str):
             # Build target filename
             action_name = action_names.get(action, f"{action}Sound")
             target_filename = f"Heroes3 - {name} - {action_name}.wav"
-            target_file = faction_dir / target_filename
+            target_file = os.path.join(faction_dir, target_filename)
             
-            # Copy file
-            shutil.copy2(source_file, target_file)
-            copied_count += 1
+            # Link file, copies only when a hardlink is not possible
+            if link_or_copy(source_file, target_file):
+                copied_count += 1
+            else:
+                up_to_date_count += 1
     
     print(f"\n{'='*60}")
     print(f"Organization complete:")
     print(f"  Files copied: {copied_count}")
+    print(f"  Files already up to date: {up_to_date_count}")
     print(f"  Files missing: {missing_count}")
 
 def main():
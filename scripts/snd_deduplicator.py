@@ -6,11 +6,18 @@ Recursively searches for .snd files, extracts their contents with deduplication
 based on xxhash, and organizes them in a new directory structure.
 """
 
+import json
 import os
+import re
 import sys
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-import xxhash
-from typing import Set
+from xxhash import xxh3_64_intdigest
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from sound_utils import LOG_BATCH, iter_files, temp_cache_path, write_file, write_json_atomic, write_lines
 
 # Add src directory to path for MMArchive imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
@@ -21,6 +28,127 @@ except ImportError:
     print("Error: MMArchiveCLI src modules not found. Ensure src/ directory exists.")
     sys.exit(1)
 
+MAX_PENDING_WRITES = 64
+
+def finish_writes(pending_writes: deque, log: list, limit: int = 0):
+    """Collect done writes and wait for the oldest beyond limit, logging failures."""
+    while pending_writes and (len(pending_writes) > limit or pending_writes[0][1].done()):
+        target_file, write = pending_writes.popleft()
+        try:
+            write.result()
+        except OSError as e:
+            log.append(f"Error writing {target_file}: {e}")
+
+SOUND_SUFFIXES = ['ATTK', 'DFND', 'KILL', 'MOVE', 'SHOT', 'WNCE', 'SUMM']
+# One regex scan per name instead of a substring scan per suffix
+SOUND_SUFFIX_RE = re.compile('|'.join(SOUND_SUFFIXES))
+
+PREFIX_SIZE = 4096
+
+def prefix_key(file_data: bytes) -> Tuple[int, int]:
+    """Cheap dedup prefilter key: size and XXH3 of the first 4KB."""
+    return len(file_data), xxh3_64_intdigest(file_data[:PREFIX_SIZE])
+
+def process_archive(snd_file: Path, matches: Optional[tuple] = None):
+    """
+    Read matching entries of one SND archive, runs in a worker process.
+    
+    matches is the cached (entry count, [(index, output filename)]) of an
+    unchanged archive; the name filter pass is then skipped, and archives
+    without matches are not opened at all.
+    
+    Returns:
+        Entry count, (index, output filename) of every matching entry and
+        (output filename, prefix key, data) of every matching entry
+    """
+    if matches is not None:
+        entry_count, matched = matches
+        if not matched:
+            return entry_count, matched, []
+        snd = rs_load_mm_archive(str(snd_file))
+    else:
+        # Open SND file using MMArchive
+        snd = rs_load_mm_archive(str(snd_file))
+        entry_count = snd.files.count
+        
+        matched = []
+        for i in range(entry_count):
+            # Names are normalized once: NULs dropped, uppercased for both checks
+            filename = snd.files.get_name(i).replace('\x00', '')
+            filename_upper = filename.upper()
+            
+            if SOUND_SUFFIX_RE.search(filename_upper):
+                # "FILEwav" -> "FILE.wav", anything else gets .wav appended
+                if filename_upper.endswith('WAV'):
+                    filename = filename[:-3] + '.wav'
+                else:
+                    filename += '.wav'
+                matched.append((i, filename))
+    
+    # Extract file data to memory, all entries through one archive stream
+    matching_files = []
+    file_datas = snd.extract_arrays([i for i, _ in matched])
+    for (i, filename), file_data in zip(matched, file_datas):
+        matching_files.append((filename, prefix_key(file_data), file_data))
+    
+    return entry_count, matched, matching_files
+
+@lru_cache(maxsize=8)
+def open_archive(snd_file: Path):
+    """Open an SND archive in this process, keeping the last few open for re-reads."""
+    return rs_load_mm_archive(str(snd_file))
+
+def load_match_cache(cache_path: Path) -> dict:
+    """Load cached matching entries per archive, empty if missing or unreadable."""
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def iter_archive_tasks(source_root: str, match_cache: dict):
+    """
+    Yield (snd_file, stamp, cached matches or None) for every .snd file.
+    
+    Cached matches are used only while the archive's mtime and size are the
+    ones they were recorded with.
+    """
+    for entry in iter_files(source_root, ".snd"):
+        stat = entry.stat()
+        stamp = [stat.st_mtime_ns, stat.st_size]
+        cached = match_cache.get(entry.path)
+        if cached and cached['stamp'] == stamp:
+            yield Path(entry.path), stamp, (cached['count'], cached['matches'])
+        else:
+            yield Path(entry.path), stamp, None
+
+def iter_processed_archives(tasks: Iterable[Tuple[Path, list, Optional[tuple]]]):
+    """
+    Yield (snd_file, stamp, future of process_archive) in input order.
+    
+    Archives are read in worker processes with a bounded number in flight;
+    on a single CPU they are read inline.
+    """
+    workers = os.cpu_count() or 1
+    if workers == 1:
+        for snd_file, stamp, matches in tasks:
+            future = Future()
+            try:
+                future.set_result(process_archive(snd_file, matches))
+            except Exception as e:
+                future.set_exception(e)
+            yield snd_file, stamp, future
+        return
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for snd_file, stamp, matches in tasks:
+            pending.append((snd_file, stamp, executor.submit(process_archive, snd_file, matches)))
+            if len(pending) > 2 * workers:
+                yield pending.popleft()
+        while pending:
+            yield pending.popleft()
+
 def extract_snd_files_deduplicated(source_root: str, target_root: str):
     """
     Extract SND files with deduplication based on xxhash.
@@ -36,88 +164,103 @@ def extract_snd_files_deduplicated(source_root: str, target_root: str):
         print(f"Error: Source directory {source_root} does not exist")
         return
     
-    seen_hashes: Set[str] = set()
+    # Files are told apart by size and first 4KB; full XXH3 hashes are only
+    # computed for keys seen more than once. seen_prefixes maps a key to the
+    # (archive, index) of the first file seen with it, which is read again
+    # from the archive when the key repeats and its full hash is added to
+    # seen_hashes, so promotion never depends on that file's write.
+    seen_prefixes: Dict[Tuple[int, int], Optional[Tuple[Path, int]]] = {}
+    seen_hashes: Set[int] = set()
     processed_files = 0
     skipped_files = 0
     extracted_files = 0
     
     print(f"Searching for .snd files in {source_root}")
     
-    # Find all .snd files recursively
-    snd_files = sorted(list(source_path.rglob("*.snd")))
-    print(f"Found {len(snd_files)} .snd files")
+    # Find all .snd files recursively, streamed in sorted order so processing
+    # starts before the whole tree has been walked. Matching entries of each
+    # archive are cached in the temp directory for re-runs
+    cache_path = temp_cache_path('mm_snd_matches', source_root)
+    match_cache = load_match_cache(cache_path)
+    new_match_cache = {}
+    archive_count = 0
     
-    for snd_file in snd_files:
+    # Dedup stays in this process, in archive order; files are written by a
+    # small thread pool so disk I/O overlaps with reading the next archives.
+    # Progress is printed in batches
+    log = []
+    write_pool = ThreadPoolExecutor(max_workers=4)
+    pending_writes = deque()
+    for snd_file, stamp, future in iter_processed_archives(iter_archive_tasks(source_root, match_cache)):
+        archive_count += 1
+        finish_writes(pending_writes, log, MAX_PENDING_WRITES)
+        if len(log) >= LOG_BATCH:
+            write_lines(log)
         try:
-            print(f"Processing {snd_file}")
+            log.append(f"Processing {snd_file}")
             
-            # Open SND file using MMArchive
-            snd = rs_load_mm_archive(str(snd_file))
+            entry_count, matched, matching_files = future.result()
+            new_match_cache[str(snd_file)] = {'stamp': stamp, 'count': entry_count, 'matches': matched}
             
-            if snd.files.count == 0:
-                print(f"  Archive appears empty (0 files)")
+            if entry_count == 0:
+                log.append(f"  Archive appears empty (0 files)")
                 continue
             
-            # Check if any files match our criteria before creating directories
-            matching_files = []
-            for i in range(snd.files.count):
-                filename = snd.files.get_name(i).rstrip('\x00')
-                filename_upper = filename.upper()
-                name_no_ext = os.path.splitext(filename)[0].upper()
-                
-
-                
-                if any(suffix in filename_upper for suffix in ['ATTK', 'DFND', 'KILL', 'MOVE', 'SHOT', 'WNCE', 'SUMM']):
-                    matching_files.append((i, filename))
-            
             if not matching_files:
-                print(f"  No matching files found (checked {snd.files.count} files)")
+                log.append(f"  No matching files found (checked {entry_count} files)")
                 continue
             
-
-            
             # Create target directory structure only if we have matching files
             rel_path = snd_file.relative_to(source_path)
             target_dir = target_path / rel_path.parent / f"{snd_file.stem}_snd"
             target_dir.mkdir(parents=True, exist_ok=True)
             
-            for i, filename in matching_files:
+            for (index, _), (filename, key, file_data) in zip(matched, matching_files):
                 processed_files += 1
                 
-                # Extract file data to memory
-                file_data = snd.extract_array(i)
-                
-                # Calculate xxhash
-                hash_obj = xxhash.xxh64()
-                hash_obj.update(file_data)
-                file_hash = hash_obj.hexdigest()
-                
-                if file_hash in seen_hashes:
-                    skipped_files += 1
-                    continue
-                
-                seen_hashes.add(file_hash)
+                if key in seen_prefixes:
+                    # Promote the first file with this key to a full hash
+                    first = seen_prefixes[key]
+                    if first is not None:
+                        seen_prefixes[key] = None
+                        first_file, first_index = first
+                        try:
+                            first_data, = open_archive(first_file).extract_arrays([first_index])
+                            seen_hashes.add(xxh3_64_intdigest(first_data))
+                        except Exception as e:
+                            log.append(f"Error re-reading entry {first_index} of {first_file}: {e}")
+                    
+                    file_hash = xxh3_64_intdigest(file_data)
+                    if file_hash in seen_hashes:
+                        skipped_files += 1
+                        continue
+                    seen_hashes.add(file_hash)
                 
                 # Write unique file to disk
-                clean_filename = filename.replace('\x00', '')
-                if clean_filename.upper().endswith('WAV'):
-                    clean_filename = clean_filename[:-3] + '.wav'
-                elif not clean_filename.lower().endswith('.wav'):
-                    clean_filename += '.wav'
-                target_file = target_dir / clean_filename
-                with open(target_file, 'wb') as f:
-                    f.write(file_data)
+                target_file = target_dir / filename
+                write = write_pool.submit(write_file, target_file, file_data)
+                pending_writes.append((target_file, write))
+                
+                if key not in seen_prefixes:
+                    seen_prefixes[key] = (snd_file, index)
                 
                 extracted_files += 1
                 
                 if extracted_files % 100 == 0:
-                    print(f"  Extracted {extracted_files} unique files, skipped {skipped_files} duplicates")
+                    log.append(f"  Extracted {extracted_files} unique files, skipped {skipped_files} duplicates")
             
         except Exception as e:
-            print(f"Error processing {snd_file}: {e}")
+            log.append(f"Error processing {snd_file}: {e}")
             continue
+    finish_writes(pending_writes, log)
+    write_pool.shutdown()
+    write_lines(log)
+    
+    if new_match_cache != match_cache:
+        write_json_atomic(cache_path, new_match_cache)
     
     print(f"\nCompleted:")
+    print(f"  .snd files found: {archive_count}")
     print(f"  Total files processed: {processed_files}")
     print(f"  Unique files extracted: {extracted_files}")
     print(f"  Duplicate files skipped: {skipped_files}")
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Sound Utils
+
+Helpers shared by the sound scripts.
+"""
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Optional: faster strict JSON parsing
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def iter_files(root: str, suffix: str):
+    """Recursively yield DirEntry objects for files ending with suffix.
+    
+    Each directory is sorted as it is visited, so entries stream out in the
+    same order as sorting all paths, without collecting them first.
+    """
+    with os.scandir(root) as it:
+        entries = sorted(it, key=lambda e: os.path.normcase(e.name))
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            yield from iter_files(entry.path, suffix)
+        elif entry.name.lower().endswith(suffix):
+            yield entry
+
+def write_file(path, data: bytes):
+    """Write bytes to a file with unbuffered os.write calls."""
+    view = memoryview(data)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o644)
+    try:
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+LOG_BATCH = 100
+
+def write_lines(lines: list):
+    """Write buffered output lines in one call and clear the buffer."""
+    if lines:
+        sys.stdout.write('\n'.join(lines) + '\n')
+        lines.clear()
+
+def write_json_atomic(path: Path, data, **kwargs):
+    """Write data as JSON through a temp file so a partial file is never read."""
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, **kwargs)
+        os.replace(tmp, path)
+    except OSError:
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+
+def temp_cache_path(prefix: str, root: str) -> Path:
+    """Cache file in the temp directory, named after prefix and the absolute root path."""
+    root = os.path.abspath(root)
+    return Path(tempfile.gettempdir()) / f"{prefix}_{hashlib.md5(root.encode()).hexdigest()}.json"
+
+def load_json5_cached(json5_path: str):
+    """Load a JSON5 file through a plain JSON cache stored next to it.
+    
+    json5 parses in pure Python; the cache is read with orjson (or the C json
+    module) and rebuilt whenever the source file is newer. Files that are
+    already strict JSON are parsed that way directly.
+    """
+    loads = orjson.loads if orjson else json.loads
+    source = Path(json5_path)
+    source_mtime = source.stat().st_mtime
+    cache = source.with_suffix('.cache.json')
+    try:
+        if cache.stat().st_mtime >= source_mtime:
+            with open(cache, 'rb') as f:
+                return loads(f.read())
+    except (OSError, ValueError):
+        pass
+    
+    with open(source, 'rb') as f:
+        raw = f.read()
+    try:
+        # Strict JSON needs neither json5 nor a cache copy
+        return loads(raw)
+    except ValueError:
+        pass
+    
+    try:
+        import json5
+    except ImportError:
+        print("Error: json5 library required. Install with: pip install json5")
+        sys.exit(1)
+    data = json5.loads(raw.decode('utf-8'))
+    write_json_atomic(cache, data, ensure_ascii=False)
+    return data
+
+def load_wav_index(sound_dir: str) -> dict:
+    """Map uppercase WAV stem to path for every WAV under sound_dir.
+    
+    The index is cached in the temp directory together with the mtime of
+    every directory walked, and reused while none of those mtimes changed
+    (adding, removing or renaming a file updates its directory's mtime).
+    """
+    root = os.path.abspath(sound_dir)
+    cache = temp_cache_path('mm_wav_index', root)
+    try:
+        with open(cache, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        if all(os.stat(path).st_mtime_ns == mtime for path, mtime in cached['dirs'].items()):
+            return {sys.intern(stem): path for stem, path in cached['files'].items()}
+    except (OSError, ValueError, KeyError):
+        pass
+    
+    dirs = {}
+    files = {}
+    stack = [root]
+    while stack:
+        path = stack.pop()
+        dirs[path] = os.stat(path).st_mtime_ns
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.lower().endswith('.wav'):
+                    files[sys.intern(entry.name[:-4].upper())] = entry.path
+    
+    write_json_atomic(cache, {'dirs': dirs, 'files': files})
+    return files
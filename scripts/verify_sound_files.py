@@ -9,18 +9,13 @@ import json
 import sys
 from pathlib import Path
 
-try:
-    import json5
-except ImportError:
-    print("Error: json5 library required. Install with: pip install json5")
-    sys.exit(1)
+from sound_utils import load_json5_cached, load_wav_index
 
 def verify_sound_files(creatures_json_path: str, sound_dir: str):
     """Verify all sound files exist."""
     
     try:
-        with open(creatures_json_path, 'r', encoding='utf-8') as f:
-            creatures_data = json5.load(f)
+        creatures_data = load_json5_cached(creatures_json_path)
     except FileNotFoundError:
         print(f"Error: creatures.json not found at {creatures_json_path}")
         return
@@ -31,25 +26,18 @@ def verify_sound_files(creatures_json_path: str, sound_dir: str):
         return
     
     # Build case-insensitive lookup of all wav files
-    all_wav_files = {}
-    for wav_file in sound_path.rglob("*.wav"):
-        all_wav_files[wav_file.stem.upper()] = str(wav_file)
+    all_wav_files = load_wav_index(sound_dir).keys()
     
     print(f"Found {len(all_wav_files)} WAV files in {sound_dir}\n")
     
-    missing = []
-    found_count = 0
-    
-    for creature_key, creature_info in creatures_data.items():
-        if isinstance(creature_info, dict) and 'sounds' in creature_info:
-            name = creature_info.get('name', creature_key)
-            
-            for action, filename in creature_info['sounds'].items():
-                # Check case-insensitive
-                if filename.upper() not in all_wav_files:
-                    missing.append((creature_key, name, action, filename))
-                else:
-                    found_count += 1
+    # Collect every reference, then find missing names with one set difference
+    references = [(creature_key, creature_info.get('name', creature_key), action, filename, filename.upper())
+                  for creature_key, creature_info in creatures_data.items()
+                  if isinstance(creature_info, dict) and 'sounds' in creature_info
+                  for action, filename in creature_info['sounds'].items()]
+    missing_names = {ref[4] for ref in references} - all_wav_files
+    missing = [ref[:4] for ref in references if ref[4] in missing_names]
+    found_count = len(references) - len(missing)
     
     print(f"Verified {found_count} sound files exist\n")
     print(f"Total creatures with sounds: {sum(1 for c in creatures_data.values() if isinstance(c, dict) and 'sounds' in c)}")
@@ -8,14 +8,21 @@ remaining files for creatures without sound data (factory/cove).
 
 import json
 import os
+import re
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Tuple
+from types import MappingProxyType
+from typing import Dict, List, Optional, Tuple
 import sys
 
+from sound_utils import iter_files
+
 try:
-    from fuzzywuzzy import fuzz, process
+    from rapidfuzz import fuzz, process
+    from rapidfuzz.utils import default_process
 except ImportError:
-    print("Error: fuzzywuzzy library required. Install with: pip install fuzzywuzzy")
+    print("Error: rapidfuzz library required. Install with: pip install rapidfuzz")
     sys.exit(1)
 
 try:
@@ -24,6 +31,77 @@ except ImportError:
     print("Error: json5 library required. Install with: pip install json5")
     sys.exit(1)
 
+# Optional: faster strict JSON parsing
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Faction JSON sound keys to our sound keys (the values are identifier-like
+# literals, so every mapping shares the same interned action strings)
+FACTION_ACTIONS = MappingProxyType({
+    'attack': 'Attack',
+    'defend': 'Defend',
+    'killed': 'Death',
+    'move': 'Move',
+    'wince': 'Hurt',
+    'shoot': 'Shoot',
+    'summon': 'Summon'
+})
+
+# Action suffix to sound key mapping
+SUFFIX_ACTIONS = MappingProxyType({
+    'ATTK': 'Attack',
+    'DFND': 'Defend',
+    'KILL': 'Death',
+    'MOVE': 'Move',
+    'SHOT': 'Shoot',
+    'WNCE': 'Hurt',
+    'SUMM': 'Summon'
+})
+SUFFIX_RE = re.compile(r'(ATTK|DFND|KILL|MOVE|SHOT|WNCE|SUMM)\Z', re.IGNORECASE)
+
+def load_json_file(json_path) -> dict:
+    """Parse a JSON file with the C parser, falling back to json5 for JSON5 syntax."""
+    # One unbuffered readall; a read buffer only adds a copy for whole-file reads
+    with open(json_path, 'rb', buffering=0) as f:
+        raw = f.read()
+    try:
+        return orjson.loads(raw) if orjson else json.loads(raw)
+    except ValueError:
+        return json5.loads(raw.decode('utf-8'))
+
+def parse_faction_file(json_file: Path, prefix: str) -> Tuple[Dict[str, Dict[str, str]], Optional[Exception]]:
+    """
+    Parse one faction JSON file into sound mappings.
+    
+    Returns:
+        Tuple of (mappings parsed so far, error or None)
+    """
+    sound_mappings = {}
+    try:
+        faction_data = load_json_file(json_file)
+        
+        for creature_key, creature_info in faction_data.items():
+            if isinstance(creature_info, dict) and 'sound' in creature_info:
+                # Convert sound keys to our format
+                sounds = {}
+                for action, filepath in creature_info['sound'].items():
+                    # Map their keys to our keys
+                    if action in FACTION_ACTIONS:
+                        # hota entries hold a path; keep the last part after /
+                        filename = filepath.split('/')[-1] if prefix == 'hota' else filepath
+                        # Remove .wav extension
+                        sounds[FACTION_ACTIONS[action]] = filename.replace('.wav', '')
+                
+                if sounds:
+                    # Prepend the prefix to match creatures.json format
+                    full_key = sys.intern(f"{prefix}.{creature_key}")
+                    sound_mappings[full_key] = sounds
+    except Exception as e:
+        return sound_mappings, e
+    return sound_mappings, None
+
 def load_faction_sounds(creatures_dir: str) -> Dict[str, Dict[str, str]]:
     """
     Load sound mappings from creatures/*.json files.
@@ -35,74 +113,24 @@ def load_faction_sounds(creatures_dir: str) -> Dict[str, Dict[str, str]]:
     if not creatures_path.exists():
         return {}
     
-    sound_mappings = {}
-    
-    # Load from creatures/*.json (sod factions)
-    for json_file in creatures_path.glob('*.json'):
-        try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                faction_data = json5.load(f)
-            
-            for creature_key, creature_info in faction_data.items():
-                if isinstance(creature_info, dict) and 'sound' in creature_info:
-                    # Convert sound keys to our format and remove .wav extension
-                    sounds = {}
-                    for action, filename in creature_info['sound'].items():
-                        # Map their keys to our keys
-                        action_map = {
-                            'attack': 'Attack',
-                            'defend': 'Defend',
-                            'killed': 'Death',
-                            'move': 'Move',
-                            'wince': 'Hurt',
-                            'shoot': 'Shoot',
-                            'summon': 'Summon'
-                        }
-                        if action in action_map:
-                            # Remove .wav extension
-                            sounds[action_map[action]] = filename.replace('.wav', '')
-                    
-                    if sounds:
-                        # Prepend "sod." to match creatures.json format
-                        full_key = f"sod.{creature_key}"
-                        sound_mappings[full_key] = sounds
-        except Exception as e:
-            print(f"Warning: Error loading {json_file}: {e}")
-    
-    # Load from creatures/hota/*/*.json (hota factions)
+    # creatures/*.json are sod factions, creatures/hota/*/*.json are hota factions
+    tasks = [(json_file, 'sod') for json_file in creatures_path.glob('*.json')]
     hota_path = creatures_path / 'hota'
     if hota_path.exists():
-        for json_file in hota_path.rglob('*.json'):
-            try:
-                with open(json_file, 'r', encoding='utf-8') as f:
-                    faction_data = json5.load(f)
-                
-                for creature_key, creature_info in faction_data.items():
-                    if isinstance(creature_info, dict) and 'sound' in creature_info:
-                        # Convert sound keys to our format
-                        sounds = {}
-                        for action, filepath in creature_info['sound'].items():
-                            # Map their keys to our keys
-                            action_map = {
-                                'attack': 'Attack',
-                                'defend': 'Defend',
-                                'killed': 'Death',
-                                'move': 'Move',
-                                'wince': 'Hurt',
-                                'shoot': 'Shoot',
-                                'summon': 'Summon'
-                            }
-                            if action in action_map:
-                                # Extract filename from path (last part after /)
-                                filename = filepath.split('/')[-1].replace('.wav', '')
-                                sounds[action_map[action]] = filename
-                        
-                        if sounds:
-                            # Prepend "hota." to match creatures.json format
-                            full_key = f"hota.{creature_key}"
-                            sound_mappings[full_key] = sounds
-            except Exception as e:
-                print(f"Warning: Error loading {json_file}: {e}")
+        tasks += [(json_file, 'hota') for json_file in hota_path.rglob('*.json')]
+    
+    sound_mappings = {}
+    if not tasks:
+        return sound_mappings
+    
+    # Read and parse files concurrently, merge in discovery order
+    with ThreadPoolExecutor(max_workers=min(len(tasks), (os.cpu_count() or 1) * 2)) as executor:
+        futures = [executor.submit(parse_faction_file, json_file, prefix) for json_file, prefix in tasks]
+        for (json_file, _), future in zip(tasks, futures):
+            mappings, error = future.result()
+            sound_mappings.update(mappings)
+            if error is not None:
+                print(f"Warning: Error loading {json_file}: {error}")
     
     return sound_mappings
 
@@ -114,8 +142,7 @@ def load_creatures_json(json_path: str) -> Dict[str, str]:
         Dict mapping creature keys to names
     """
     try:
-        with open(json_path, 'r', encoding='utf-8') as f:
-            creatures_data = json5.load(f)
+        creatures_data = load_json_file(json_path)
         
         # Extract name field from each creature
         name_mapping = {}
@@ -131,6 +158,18 @@ def load_creatures_json(json_path: str) -> Dict[str, str]:
         print(f"Error: Invalid JSON in {json_path}: {e}")
         sys.exit(1)
 
+def split_action_suffix(filename_stem: str) -> Tuple[str, Optional[str]]:
+    """
+    Split a trailing action suffix off a filename stem.
+    
+    Returns:
+        Tuple of (cleaned stem, action name or None)
+    """
+    m = SUFFIX_RE.search(filename_stem)
+    if not m:
+        return filename_stem, None
+    return filename_stem[:m.start()], SUFFIX_ACTIONS[m.group(1).upper()]
+
 def remove_action_suffixes(filename_stem: str) -> str:
     """
     Remove action suffixes from filename stem.
@@ -141,22 +180,52 @@ def remove_action_suffixes(filename_stem: str) -> str:
     Returns:
         Cleaned filename stem
     """
-    suffixes = ['ATTK', 'DFND', 'KILL', 'MOVE', 'SHOT', 'WNCE', 'SUMM']
-    
-    stem_upper = filename_stem.upper()
-    for suffix in suffixes:
-        if stem_upper.endswith(suffix):
-            return filename_stem[:-len(suffix)]
-    
-    return filename_stem
+    return split_action_suffix(filename_stem)[0]
+
+class CreatureIndex:
+    """Creature names normalized once for repeated matching."""
+    
+    def __init__(self, creature_names: Dict[str, str]):
+        self.keys = list(creature_names.keys())
+        self.names = list(creature_names.values())
+        self.lower_names = [name.lower() for name in self.names]
+        # Upgraded variants often share a name; score each distinct name once
+        first_positions = {}
+        for i, name in enumerate(self.names):
+            first_positions.setdefault(default_process(name), i)
+        self.choices = list(first_positions)
+        self.choice_positions = list(first_positions.values())
+        self.sorted_lower_names = sorted((name, i) for i, name in enumerate(self.lower_names))
+        self.exact = {}
+        for i, name in enumerate(self.lower_names):
+            self.exact.setdefault(name, i)
+        self.match_cache = {}
+    
+    def exact_match(self, stem_lower: str) -> int:
+        """Return the first creature index whose name equals stem_lower, or -1."""
+        return self.exact.get(stem_lower, -1)
+    
+    def prefix_match(self, stem_lower: str) -> int:
+        """Return the first creature index whose name starts with stem_lower, or -1."""
+        pos = bisect_left(self.sorted_lower_names, (stem_lower, -1))
+        best = -1
+        # Names sharing the prefix are contiguous; keep original order priority
+        while pos < len(self.sorted_lower_names):
+            name, i = self.sorted_lower_names[pos]
+            if not name.startswith(stem_lower):
+                break
+            if best < 0 or i < best:
+                best = i
+            pos += 1
+        return best
 
-def find_best_creature_match(cleaned_stem: str, creature_names: Dict[str, str], threshold: int = 60) -> Tuple[str, str, int]:
+def find_best_creature_match(cleaned_stem: str, index: CreatureIndex, threshold: int = 60) -> Tuple[str, str, int]:
     """
     Find the best matching creature name using fuzzy matching.
     
     Args:
         cleaned_stem: Cleaned filename stem
-        creature_names: Dict of creature key -> name mappings
+        index: CreatureIndex built from creature key -> name mappings
         threshold: Minimum match score (0-100)
         
     Returns:
@@ -165,45 +234,88 @@ def find_best_creature_match(cleaned_stem: str, creature_names: Dict[str, str],
     if not cleaned_stem:
         return "", "", 0
     
+    # Action variants of one creature share a stem; score it only once
+    cache_key = (cleaned_stem.lower(), threshold)
+    result = index.match_cache.get(cache_key)
+    if result is None:
+        result = _match_creature(cache_key[0], index, threshold)
+        index.match_cache[cache_key] = result
+    return result
+
+def _match_creature(stem_lower: str, index: CreatureIndex, threshold: int) -> Tuple[str, str, int]:
+    """Uncached body of find_best_creature_match for a lowercased stem."""
+    # An exact name match skips prefix and fuzzy scoring entirely
+    exact_index = index.exact_match(stem_lower)
+    if exact_index >= 0:
+        return index.keys[exact_index], index.names[exact_index], 100
+    
     # First, check for exact prefix matches (highest priority)
-    for key, name in creature_names.items():
-        if name.lower().startswith(cleaned_stem.lower()):
-            # Found a creature whose name starts with the file prefix - use it!
-            return key, name, 100
-    
-    # Create list of all creature names for fuzzy matching
-    names_list = list(creature_names.values())
-    
-    # Try multiple fuzzy matching methods
-    methods = [
-        fuzz.ratio,
-        fuzz.partial_ratio,
-        fuzz.token_sort_ratio,
-        fuzz.token_set_ratio
-    ]
-    
-    best_match = None
-    best_score = 0
-    
-    for method in methods:
-        match = process.extractOne(cleaned_stem.lower(), [name.lower() for name in names_list], scorer=method)
-        if match and match[1] > best_score:
-            # Find original name that matches the lowercase result
-            original_name = next((name for name in names_list if name.lower() == match[0]), match[0])
-            best_match = (original_name, match[1])
-            best_score = match[1]
-    
-    if best_match and best_match[1] >= threshold:
-        matched_name = best_match[0]
-        match_score = best_match[1]
-        
-        # Find the creature key for this name
-        creature_key = next((key for key, name in creature_names.items() if name == matched_name), "")
-        
-        return creature_key, matched_name, match_score
+    prefix_index = index.prefix_match(stem_lower)
+    if prefix_index >= 0:
+        # Found a creature whose name starts with the file prefix - use it!
+        return index.keys[prefix_index], index.names[prefix_index], 100
+    
+    # WRatio blends ratio, partial and token scorers in a single pass
+    match = process.extractOne(default_process(stem_lower), index.choices, scorer=fuzz.WRatio,
+                               processor=None, score_cutoff=threshold)
+    if match:
+        # extractOne reports the index of the matched choice, which gives both key and name
+        position = index.choice_positions[match[2]]
+        return index.keys[position], index.names[position], round(match[1])
     
     return "", "", 0
 
+def find_best_creature_matches(cleaned_stems: List[str], index: CreatureIndex, threshold: int = 60) -> List[Tuple[str, str, int]]:
+    """
+    Match many cleaned filename stems at once.
+    
+    Exact and prefix matches are resolved as in find_best_creature_match; every
+    remaining stem is scored against all creature names in a single
+    rapidfuzz cdist call using the same WRatio scorer.
+    
+    Args:
+        cleaned_stems: Cleaned filename stems
+        index: CreatureIndex built from creature key -> name mappings
+        threshold: Minimum match score (0-100)
+        
+    Returns:
+        List of (creature_key, creature_name, match_score) per stem
+    """
+    results = [("", "", 0)] * len(cleaned_stems)
+    pending = {}
+    
+    for i, stem in enumerate(cleaned_stems):
+        if not stem:
+            continue
+        stem_lower = stem.lower()
+        exact_index = index.exact_match(stem_lower)
+        prefix_index = exact_index if exact_index >= 0 else index.prefix_match(stem_lower)
+        if prefix_index >= 0:
+            results[i] = (index.keys[prefix_index], index.names[prefix_index], 100)
+        else:
+            # Score each distinct stem once and fan the result out
+            pending.setdefault(stem_lower, []).append(i)
+    
+    if not pending or not index.names:
+        return results
+    
+    # cdist hands back a NumPy matrix; only the fuzzy path needs numpy
+    import numpy as np
+    
+    queries = [default_process(stem_lower) for stem_lower in pending]
+    scores = process.cdist(queries, index.choices, scorer=fuzz.WRatio, processor=None,
+                           score_cutoff=threshold, dtype=np.float64, workers=-1)
+    best = scores.argmax(axis=1)
+    
+    for row, positions in enumerate(pending.values()):
+        score = scores[row, best[row]]
+        j = index.choice_positions[best[row]]
+        if score >= threshold:
+            for i in positions:
+                results[i] = (index.keys[j], index.names[j], round(score))
+    
+    return results
+
 def process_wav_files(sound_dir: str, creatures_json_path: str, creatures_dir: str, output_file: str = None):
     """
     Process WAV files and match them to creatures.
@@ -222,8 +334,7 @@ def process_wav_files(sound_dir: str, creatures_json_path: str, creatures_dir: s
     
     # Load full creatures data
     try:
-        with open(creatures_json_path, 'r', encoding='utf-8') as f:
-            creatures_data = json5.load(f)
+        creatures_data = load_json_file(creatures_json_path)
     except FileNotFoundError:
         print(f"Error: creatures.json not found at {creatures_json_path}")
         return
@@ -254,49 +365,14 @@ def process_wav_files(sound_dir: str, creatures_json_path: str, creatures_dir: s
     print(f"Loaded {len(creature_names)} creatures from JSON")
     
     # Find all WAV files recursively
-    wav_files = list(sound_path.rglob("*.wav"))
-    print(f"Found {len(wav_files)} WAV files")
-    
-    # Action suffix to sound key mapping
-    action_mapping = {
-        'ATTK': 'Attack',
-        'DFND': 'Defend', 
-        'KILL': 'Death',
-        'MOVE': 'Move',
-        'SHOT': 'Shoot',
-        'WNCE': 'Hurt',
-        'SUMM': 'Summon'
-    }
-    
-    # Track all files with action suffixes
-    file_tracking = {}
-    
-    # Track unmatched files
-    for wav_file in wav_files:
-        filename_stem = wav_file.stem
-        
-        # Determine which action this file represents
-        action_type = None
-        cleaned_stem = filename_stem
-        
-        for suffix, action in action_mapping.items():
-            if filename_stem.upper().endswith(suffix):
-                action_type = action
-                cleaned_stem = filename_stem[:-len(suffix)]
-                break
-        
-        # Skip if no action suffix found
-        if not action_type or not cleaned_stem:
-            continue
-        
-        # Check if this file is in faction files (case-insensitive)
-        if filename_stem.upper() in faction_files:
-            file_tracking[filename_stem] = True
-        else:
-            file_tracking[filename_stem] = False
+    wav_names = [entry.name for entry in iter_files(sound_dir, '.wav')]
+    print(f"Found {len(wav_names)} WAV files")
     
-    # Report all unassigned files in JSON format
-    unassigned = [filename for filename, assigned in file_tracking.items() if not assigned]
+    # Files with an action suffix and a non-empty creature prefix
+    qualifying = {stem for stem in (name[:-4] for name in wav_names) if all(split_action_suffix(stem))}
+    
+    # Report all unassigned files in JSON format (case-insensitive faction check)
+    unassigned = [stem for stem in qualifying if stem.upper() not in faction_files]
     
     faction_count = len(faction_files)
     unmatched_count = len(unassigned)
@@ -311,20 +387,20 @@ def process_wav_files(sound_dir: str, creatures_json_path: str, creatures_dir: s
         
         for filename in sorted(unassigned):
             # Find action suffix and clean stem
-            cleaned_stem = filename
-            action = None
-            
-            for suffix in action_mapping.keys():
-                if filename.upper().endswith(suffix):
-                    cleaned_stem = filename[:-len(suffix)]
-                    action = action_mapping[suffix]
-                    break
+            cleaned_stem, action = split_action_suffix(filename)
             
             if action:
                 grouped[cleaned_stem.upper()][action] = filename
         
+        # Suggest a creature for every group, all bases matched in one batch
+        bases = sorted(grouped)
+        suggestions = find_best_creature_matches(bases, CreatureIndex(creature_names))
+        
         # Print in JSON format
-        for base, sounds in sorted(grouped.items()):
+        for base, (creature_key, creature_name, score) in zip(bases, suggestions):
+            sounds = grouped[base]
+            if creature_key:
+                print(f'        // {base}: {creature_name} ({creature_key}, score {score})')
             print('        "sounds": {')
             items = list(sounds.items())
             for i, (action, filename) in enumerate(items):
@@ -333,8 +409,10 @@ def process_wav_files(sound_dir: str, creatures_json_path: str, creatures_dir: s
             print('        }\n')
     
     # Save updated creatures.json (use standard json for output)
-    with open(creatures_json_path, 'w', encoding='utf-8') as f:
-        json.dump(creatures_data, f, indent=4, ensure_ascii=False)
+    # Encode once and write once; json.dump issues a write per token
+    output = json.dumps(creatures_data, indent=4, ensure_ascii=False).encode('utf-8')
+    with open(creatures_json_path, 'wb') as f:
+        f.write(output)
     print(f"\nUpdated {creatures_json_path} with sound mappings")
 
 def main():
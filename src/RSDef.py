@@ -10,7 +10,7 @@ sergroj@mail.ru
 import struct
 import io
 from typing import Optional, Callable, List, BinaryIO
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from pathlib import Path
 
 try:
@@ -30,6 +30,23 @@ RSFullBmp = object()  # Special constant like TBitmap(1) in Pascal
 # Resource strings
 S_RS_INVALID_DEF = 'Def file is invalid'
 
+# Precompiled record layouts
+_DEF_HEADER = struct.Struct('<IIII')
+_GROUP_HEADER = struct.Struct('<IIII')
+_PIC_HEADER = struct.Struct('<8I')
+_UINT32 = struct.Struct('<I')
+_UINT16 = struct.Struct('<H')
+
+# Maps shadow index 255 to an opaque mask byte and every other index to 0
+_SHADOW_NONE_MASK = bytes(255 if i == 255 else 0 for i in range(256))
+
+# Solid runs of every byte value, long enough for any RLE run (max 256)
+_FILL_RUNS = [memoryview(bytes([c]) * 256) for c in range(256)]
+
+# Shadow codes derived from the main image: low indices kept, rest opaque
+_SHADOW_FROM_MAIN_1 = bytes(i if i < 8 else 255 for i in range(256))
+_SHADOW_FROM_MAIN_23 = bytes(i if i < 7 else 255 for i in range(256))
+
 
 # Data structures
 @dataclass
@@ -75,13 +92,16 @@ def make_log_palette(palette_data: bytes) -> List[tuple]:
     if len(palette_data) != 768:
         raise ValueError("Palette must be 768 bytes")
     
-    palette = []
-    for i in range(256):
-        r = palette_data[i * 3]
-        g = palette_data[i * 3 + 1]
-        b = palette_data[i * 3 + 2]
-        palette.append((r, g, b))
-    return palette
+    return list(zip(palette_data[0::3], palette_data[1::3], palette_data[2::3]))
+
+
+def _index_bytes(img) -> bytes:
+    """Palette indices of an image, first band for multi-band images"""
+    if img.mode in ('P', 'L'):
+        return img.tobytes()
+    if img.mode == '1':
+        return img.convert('L').tobytes()
+    return img.getchannel(0).tobytes()
 
 
 def swap_color(color: int) -> int:
@@ -89,17 +109,92 @@ def swap_color(color: int) -> int:
     return ((color & 0xFF) << 16) | (color & 0xFF00) | ((color >> 16) & 0xFF)
 
 
+def _decode_rle1(data, mv, block: int, x: int, y: int, buf: bytearray, sh_buf: bytearray):
+    """Decode type 1 RLE: pixels go to buf, special codes to sh_buf"""
+    data_len = len(data)
+    for j in range(y):
+        line_offset = _UINT32.unpack_from(data, block + j * 4)[0]
+        p = block + line_offset
+        row = j * x
+        i = 0
+        while i < x:
+            if p >= data_len - 1:
+                break
+            code = data[p]
+            length = data[p + 1] + 1
+            p += 2
+            n = min(length, x - i)
+            
+            # Whole runs are written with one slice assignment
+            if code == 255:
+                n = min(n, data_len - p)
+                if n > 0:
+                    buf[row + i:row + i + n] = mv[p:p + n]
+                p += length
+            else:
+                sh_buf[row + i:row + i + n] = _FILL_RUNS[code][:n]
+            i += length
+
+
+def _decode_rle2(data, mv, block: int, x: int, y: int, buf: bytearray, sh_buf: bytearray):
+    """Decode type 2 RLE; flag color runs (code 5) go to both buffers"""
+    data_len = len(data)
+    for j in range(y):
+        line_offset = _UINT16.unpack_from(data, block + j * 2)[0]
+        p = block + line_offset
+        row = j * x
+        i = 0
+        while i < x:
+            if p >= data_len:
+                break
+            value = data[p]
+            p += 1
+            code = value // 32
+            length = (value & 31) + 1
+            n = min(length, x - i)
+            
+            if code == 7:
+                n = min(n, data_len - p)
+                if n > 0:
+                    buf[row + i:row + i + n] = mv[p:p + n]
+                p += length
+            else:
+                run = _FILL_RUNS[code][:n]
+                sh_buf[row + i:row + i + n] = run
+                if code == 5:
+                    buf[row + i:row + i + n] = run
+            i += length
+
+
+def _decode_rle3(data, mv, block: int, x: int, y: int, buf: bytearray, sh_buf: bytearray):
+    """Decode type 3 RLE: type 2 lines over 32 pixel wide tiles"""
+    _decode_rle2(data, mv, block, 32, y * (x // 32), buf, sh_buf)
+
+
+# Frame decoders by TRSDefPic.Compression; type 0 frames are stored raw
+_DECODERS = {1: _decode_rle1, 2: _decode_rle2, 3: _decode_rle3}
+
+# Decoded frames kept per TRSDefWrapper, least recently used dropped first.
+# Enough for a shadow or msk pass over a group right after its main pass
+# without holding a whole sprite sheet while frames are decoded only once
+_FRAME_CACHE_SIZE = 64
+
+
 class TRSDefWrapper:
     """DEF file wrapper for reading and extracting sprites"""
     
     def __init__(self, data: bytes):
         self.data = data
+        # Zero-copy view for slicing pixel runs out of the file data
+        self._mv = memoryview(data)
         self.use_custom_palette = True
-        self._pic_links: Optional[List[int]] = None
-        self._pic_name_links: Optional[List[bytes]] = None
+        self._pic_links: List[int] = []
+        self._pic_name_links: List[bytes] = []
         self._pictures_count = 0
         self._pal: Optional[List[tuple]] = None
         self._pure_pal: Optional[List[tuple]] = None
+        self._pal_bytes_cache = {}
+        self._frame_cache = {}
         self.on_prepare_palette: Optional[Callable] = None
         
         self._parse_header()
@@ -110,7 +205,7 @@ class TRSDefWrapper:
             raise ERSDefException(S_RS_INVALID_DEF)
         
         # Read main header
-        type_of_def, width, height, groups_count = struct.unpack('<IIII', self.data[0:16])
+        type_of_def, width, height, groups_count = _DEF_HEADER.unpack_from(self.data, 0)
         palette = self.data[16:784]
         
         self.header = TRSDefHeader(type_of_def, width, height, groups_count, palette)
@@ -126,54 +221,33 @@ class TRSDefWrapper:
             if offset + 16 > len(self.data):
                 raise ERSDefException(S_RS_INVALID_DEF)
             
-            group_num, items_count, unk2, unk3 = struct.unpack('<IIII', self.data[offset:offset+16])
+            group_num, items_count, unk2, unk3 = _GROUP_HEADER.unpack_from(self.data, offset)
             group = TRSDefGroup(group_num, items_count, unk2, unk3)
             self.groups.append(group)
             offset += 16
             
-            # Read item names
-            names = []
-            for _ in range(items_count):
-                if offset + 13 > len(self.data):
-                    raise ERSDefException(S_RS_INVALID_DEF)
-                name = self.data[offset:offset+13]
-                names.append(name)
-                offset += 13
-            self.item_names.append(names)
+            # Names (13 bytes each) and pointers (4 bytes each) are stored
+            # as two consecutive arrays; read each array in one pass
+            names_end = offset + 13 * items_count
+            if names_end + 4 * items_count > len(self.data):
+                raise ERSDefException(S_RS_INVALID_DEF)
             
-            # Read item pointers
-            pointers = []
-            for _ in range(items_count):
-                if offset + 4 > len(self.data):
-                    raise ERSDefException(S_RS_INVALID_DEF)
-                ptr = struct.unpack('<I', self.data[offset:offset+4])[0]
-                pointers.append(ptr)
-                offset += 4
+            names = [self.data[o:o+13] for o in range(offset, names_end, 13)]
+            pointers = list(struct.unpack_from(f'<{items_count}I', self.data, names_end))
+            self.item_names.append(names)
             self.item_pointers.append(pointers)
             
+            # Flat picture lists for lookups by overall picture index
+            self._pic_name_links.extend(names)
+            self._pic_links.extend(pointers)
+            offset = names_end + 4 * items_count
+            
             self._pictures_count += items_count
     
-    def _pic_links_needed(self):
-        """Build flat list of picture offsets"""
-        if self._pic_links is None:
-            self._pic_links = []
-            for group_idx, group in enumerate(self.groups):
-                for item_idx in range(group.ItemsCount):
-                    self._pic_links.append(self.item_pointers[group_idx][item_idx])
-    
-    def _pic_name_links_needed(self):
-        """Build flat list of picture names"""
-        if self._pic_name_links is None:
-            self._pic_name_links = []
-            for group_idx, group in enumerate(self.groups):
-                for item_idx in range(group.ItemsCount):
-                    self._pic_name_links.append(self.item_names[group_idx][item_idx])
-    
     def get_pic_header(self, *args) -> TRSDefPic:
         """Get picture header by index or (group, index)"""
         if len(args) == 1:
             pic_num = args[0]
-            self._pic_links_needed()
             offset = self._pic_links[pic_num]
         else:
             group, pic_num = args
@@ -182,14 +256,13 @@ class TRSDefWrapper:
         if offset + 32 > len(self.data):
             raise ERSDefException(S_RS_INVALID_DEF)
         
-        values = struct.unpack('<8I', self.data[offset:offset+32])
+        values = _PIC_HEADER.unpack_from(self.data, offset)
         return TRSDefPic(*values)
     
     def get_pic_name(self, *args) -> str:
         """Get picture name by index or (group, index)"""
         if len(args) == 1:
             pic_num = args[0]
-            self._pic_name_links_needed()
             name_bytes = self._pic_name_links[pic_num]
         else:
             group, pic_num = args
@@ -200,123 +273,67 @@ class TRSDefWrapper:
     def rebuild_pal(self):
         """Rebuild palette from header"""
         self._pal = make_log_palette(self.header.Palette)
+        self._pal_bytes_cache.clear()
         if self.on_prepare_palette:
             self.on_prepare_palette(self, self._pal)
     
-    def _do_extract_buffer(self, offset: int, both_buffers: bool = False) -> tuple:
-        """Extract picture buffer from DEF data (DoExtractBuffer)"""
-        # Get header
-        if offset < self._pictures_count:
-            self._pic_links_needed()
-            block_offset = self._pic_links[offset]
-        else:
-            block_offset = offset
-        
-        values = struct.unpack('<8I', self.data[block_offset:block_offset+32])
-        pic_hdr = TRSDefPic(*values)
-        block = block_offset + 32
-        
-        x = pic_hdr.Width
-        y = pic_hdr.Height
-        
-        # Handle old format DEFs
-        if pic_hdr.FrameWidth > x and pic_hdr.FrameHeight > y and pic_hdr.Compression == 1:
-            pic_hdr.FrameLeft = 0
-            pic_hdr.FrameTop = 0
-            pic_hdr.FrameWidth = x
-            pic_hdr.FrameHeight = y
-            block -= 16
-        else:
-            x = pic_hdr.FrameWidth
-            y = pic_hdr.FrameHeight
-        
-        if pic_hdr.Compression == 0:
-            pic = self.data[block:block + x * y]
-            return pic_hdr, pic, None, None
-        
-        # Allocate buffers
-        buf = bytearray(x * y)
-        if both_buffers:
-            sh_buf = bytearray(x * y)
-            for i in range(len(buf)):
-                buf[i] = 0
-            for i in range(len(sh_buf)):
-                sh_buf[i] = 255
+    def _palette_bytes(self, pure: bool, bgr: bool = False) -> bytes:
+        """Flat palette data for putpalette, cached until rebuild_pal"""
+        key = (pure, bgr)
+        data = self._pal_bytes_cache.get(key)
+        if data is None:
+            if pure:
+                if self._pure_pal is None:
+                    self._pure_pal = make_log_palette(self.header.Palette)
+                pal = self._pure_pal
+            else:
+                if self._pal is None:
+                    self.rebuild_pal()
+                pal = self._pal
+            if bgr:
+                data = bytes(c for r, g, b in pal for c in (b, g, r))
+            else:
+                data = bytes(c for rgb in pal for c in rgb)
+            self._pal_bytes_cache[key] = data
+        return data
+    
+    def clear_cache(self):
+        """Drop cached decoded frames and palette data"""
+        self._frame_cache.clear()
+        self._pal_bytes_cache.clear()
+    
+    def _decode(self, offset: int, want_shadow: bool = True) -> tuple:
+        """Decode a picture given its index or raw offset
+        
+        Returns (pic_hdr, buf, sh_buf). Type 0 pictures are returned as raw
+        data with sh_buf None. Without want_shadow special codes are merged
+        into buf and sh_buf is None. Recently used results are cached by
+        picture offset until clear_cache; every call gets its own pic_hdr.
+        """
+        if isinstance(offset, int) and offset < self._pictures_count:
+            key = (self._pic_links[offset], want_shadow)
         else:
-            sh_buf = buf
-        
-        # Decompress
-        if pic_hdr.Compression == 1:
-            for j in range(y):
-                line_offset = struct.unpack('<I', self.data[block + j * 4:block + j * 4 + 4])[0]
-                p = block + line_offset
-                i = 0
-                while i < x:
-                    if p >= len(self.data) - 1:
-                        break
-                    code = self.data[p]
-                    p += 1
-                    value = self.data[p]
-                    p += 1
-                    length = value + 1
-                    
-                    if code == 255:
-                        for k in range(min(length, x - i)):
-                            if p + k < len(self.data):
-                                buf[j * x + i + k] = self.data[p + k]
-                        p += length
-                    else:
-                        for k in range(min(length, x - i)):
-                            sh_buf[j * x + i + k] = code
-                    i += length
-                    if i < 0:
-                        break
-        
-        elif pic_hdr.Compression in [2, 3]:
-            if pic_hdr.Compression == 3:
-                y = y * (x // 32)
-                x = 32
-            
-            for j in range(y):
-                line_offset = struct.unpack('<H', self.data[block + j * 2:block + j * 2 + 2])[0]
-                p = block + line_offset
-                i = 0
-                while i < x:
-                    if p >= len(self.data):
-                        break
-                    value = self.data[p]
-                    p += 1
-                    code = value // 32
-                    length = (value & 31) + 1
-                    
-                    if code == 7:
-                        for k in range(min(length, x - i)):
-                            if p + k < len(self.data):
-                                buf[j * x + i + k] = self.data[p + k]
-                        p += length
-                    else:
-                        for k in range(min(length, x - i)):
-                            sh_buf[j * x + i + k] = code
-                            if code == 5 and both_buffers:
-                                buf[j * x + i + k] = code
-                    i += length
-                    if i < 0:
-                        break
-        
-        pic = self.data[block:block + 1] if buf is None else bytes(buf)
-        return pic_hdr, pic, bytes(buf) if buf else None, bytes(sh_buf) if sh_buf != buf else None
-    
-    def _extract_buffer(self, offset: int) -> tuple:
-        """Extract picture buffer from DEF data"""
+            key = (offset, want_shadow)
+        result = self._frame_cache.pop(key, None)
+        if result is None:
+            result = self._decode_frame(offset, want_shadow)
+            if len(self._frame_cache) >= _FRAME_CACHE_SIZE:
+                del self._frame_cache[next(iter(self._frame_cache))]
+        # Reinserted last, so the oldest key is always the least recently used
+        self._frame_cache[key] = result
+        pic_hdr, buf, sh_buf = result
+        return replace(pic_hdr), buf, sh_buf
+    
+    def _decode_frame(self, offset: int, want_shadow: bool) -> tuple:
+        """Decode a picture without caching (see _decode)"""
         pic_hdr = self.get_pic_header(offset) if isinstance(offset, int) and offset < self._pictures_count else None
         
         if pic_hdr is None:
             # Parse from raw offset
-            values = struct.unpack('<8I', self.data[offset:offset+32])
+            values = _PIC_HEADER.unpack_from(self.data, offset)
             pic_hdr = TRSDefPic(*values)
             block_offset = offset + 32
         else:
-            self._pic_links_needed()
             block_offset = self._pic_links[offset] + 32
         
         x = pic_hdr.FrameWidth
@@ -339,76 +356,24 @@ class TRSDefWrapper:
         
         # Decompress
         buf = bytearray(x * y)
-        sh_buf = bytearray(x * y)
+        sh_buf = bytearray(b'\xff' * (x * y)) if want_shadow else buf
         
-        for i in range(len(sh_buf)):
-            sh_buf[i] = 255
+        decoder = _DECODERS.get(pic_hdr.Compression)
+        if decoder:
+            decoder(self.data, self._mv, block_offset, x, y, buf, sh_buf)
         
-        if pic_hdr.Compression == 1:
-            # Type 1 compression
-            offsets_size = y * 4
-            for j in range(y):
-                line_offset = struct.unpack('<I', self.data[block_offset + j * 4:block_offset + j * 4 + 4])[0]
-                p = block_offset + line_offset
-                i = 0
-                
-                while i < x:
-                    if p >= len(self.data) - 1:
-                        break
-                    code = self.data[p]
-                    p += 1
-                    value = self.data[p]
-                    p += 1
-                    length = value + 1
-                    
-                    if code == 255:
-                        # Copy pixels
-                        for k in range(min(length, x - i)):
-                            if p + k < len(self.data):
-                                buf[j * x + i + k] = self.data[p + k]
-                        p += length
-                    else:
-                        # Fill shadow
-                        for k in range(min(length, x - i)):
-                            sh_buf[j * x + i + k] = code
-                    
-                    i += length
-        
-        elif pic_hdr.Compression in [2, 3]:
-            # Type 2/3 compression
-            if pic_hdr.Compression == 3:
-                y = y * (x // 32)
-                x = 32
-            
-            for j in range(y):
-                line_offset = struct.unpack('<H', self.data[block_offset + j * 2:block_offset + j * 2 + 2])[0]
-                p = block_offset + line_offset
-                i = 0
-                
-                while i < x:
-                    if p >= len(self.data):
-                        break
-                    value = self.data[p]
-                    p += 1
-                    code = value // 32
-                    length = (value & 31) + 1
-                    
-                    if code == 7:
-                        # Copy pixels
-                        for k in range(min(length, x - i)):
-                            if p + k < len(self.data):
-                                buf[j * x + i + k] = self.data[p + k]
-                        p += length
-                    else:
-                        # Fill shadow
-                        for k in range(min(length, x - i)):
-                            sh_buf[j * x + i + k] = code
-                            if code == 5:  # Flag color
-                                buf[j * x + i + k] = code
-                    
-                    i += length
-        
-        return pic_hdr, bytes(buf), bytes(sh_buf)
+        return pic_hdr, bytes(buf), bytes(sh_buf) if want_shadow else None
+    
+    def _do_extract_buffer(self, offset: int, both_buffers: bool = False) -> tuple:
+        """Extract picture buffer from DEF data (DoExtractBuffer)"""
+        pic_hdr, buf, sh_buf = self._decode(offset, both_buffers)
+        if pic_hdr.Compression == 0:
+            return pic_hdr, buf, None, None
+        return pic_hdr, buf, buf or None, sh_buf if sh_buf != buf else None
+    
+    def _extract_buffer(self, offset: int) -> tuple:
+        """Extract picture buffer from DEF data"""
+        return self._decode(offset)
     
     def _do_extract_bmp(self, offset: int, bmp, bmp_spec):
         """Extract bitmap (DoExtractBmp)"""
@@ -422,14 +387,7 @@ class TRSDefWrapper:
             bmp = Image.new('P', (0, 0))
             
             # Set palette
-            if bmp_spec is None:
-                if self._pal is None:
-                    self.rebuild_pal()
-                pal_data = [c for rgb in self._pal for c in rgb]
-            else:
-                if self._pure_pal is None:
-                    self._pure_pal = make_log_palette(self.header.Palette)
-                pal_data = [c for rgb in self._pure_pal for c in rgb]
+            pal_data = self._palette_bytes(bmp_spec is not None)
             
             # Create bitmap
             bmp = Image.new('P', (pic_hdr.Width, pic_hdr.Height), 0)
@@ -442,9 +400,7 @@ class TRSDefWrapper:
                 bmp.paste(frame, (pic_hdr.FrameLeft, pic_hdr.FrameTop))
         
         if bmp_spec is not None:
-            if self._pure_pal is None:
-                self._pure_pal = make_log_palette(self.header.Palette)
-            pal_data = [c for rgb in self._pure_pal for c in rgb]
+            pal_data = self._palette_bytes(True)
             
             bmp_spec = Image.new('P', (pic_hdr.Width, pic_hdr.Height), 0)
             bmp_spec.putpalette(pal_data)
@@ -465,42 +421,25 @@ class TRSDefWrapper:
             raise ImportError("PIL/Pillow required")
         
         w, h = bmp.size
-        result = Image.new('RGBA', (w, h), (0, 0, 0, 0))
+        if w == 0 or h == 0:
+            return Image.new('RGBA', (w, h), (0, 0, 0, 0))
         
-        if h == 0:
-            return result
+        # Palette lookups done by Pillow; entries are written B, G, R to match
+        # the swap_color round trip of the Pascal code
+        pal1 = self._palette_bytes(True, bgr=True)
+        pal2 = self._palette_bytes(False, bgr=True)
         
-        if self._pure_pal is None:
-            self._pure_pal = make_log_palette(self.header.Palette)
-        if self._pal is None:
-            self.rebuild_pal()
-        
-        # Convert palettes to lookup arrays
-        pal1 = [swap_color((r << 16) | (g << 8) | b) for r, g, b in self._pure_pal]
-        pal2 = [swap_color((r << 16) | (g << 8) | b) for r, g, b in self._pal]
+        main_idx = _index_bytes(bmp)
+        spec_idx = _index_bytes(bmp_spec)
         
-        # Get pixel data
-        pixels1 = bmp.load()
-        pixels2 = bmp_spec.load()
-        result_pixels = result.load()
-        
-        for y in range(h):
-            for x in range(w):
-                p1 = pixels1[x, y] if isinstance(pixels1[x, y], int) else pixels1[x, y][0]
-                p2 = pixels2[x, y] if isinstance(pixels2[x, y], int) else pixels2[x, y][0]
-                
-                if p2 == 255:
-                    color = pal1[p1]
-                else:
-                    color = pal2[p2]
-                
-                # Convert back to RGB
-                r = (color >> 16) & 0xFF
-                g = (color >> 8) & 0xFF
-                b = color & 0xFF
-                result_pixels[x, y] = (r, g, b, 255)
+        main = Image.frombytes('P', (w, h), main_idx)
+        main.putpalette(pal1)
+        spec = Image.frombytes('P', (w, h), spec_idx)
+        spec.putpalette(pal2)
         
-        return result
+        # Shadow index 255 means "no shadow here", show the main picture
+        mask = Image.frombytes('L', (w, h), spec_idx.translate(_SHADOW_NONE_MASK))
+        return Image.composite(main.convert('RGBA'), spec.convert('RGBA'), mask)
     
     def extract_bmp(self, *args, bitmap=None, bmp_spec=None):
         """Extract bitmap by index or (group, index)
@@ -522,7 +461,6 @@ class TRSDefWrapper:
         
         if len(args) == 1:
             pic_num = args[0]
-            self._pic_links_needed()
             offset = self._pic_links[pic_num]
         else:
             group, pic_num = args
@@ -543,10 +481,7 @@ class TRSDefWrapper:
             b1 = Image.new('P', (pic_hdr.Width, pic_hdr.Height), 0)
             b2 = Image.new('P', (pic_hdr.Width, pic_hdr.Height), 0)
             
-            if self._pure_pal is None:
-                self._pure_pal = make_log_palette(self.header.Palette)
-            
-            pal_data = [c for rgb in self._pure_pal for c in rgb]
+            pal_data = self._palette_bytes(True)
             b1.putpalette(pal_data)
             b2.putpalette(pal_data)
             
@@ -565,22 +500,24 @@ class TRSDefWrapper:
         
         # Create main image
         img = Image.new('P', (pic_hdr.Width, pic_hdr.Height), 0)
-        img.putpalette([c for rgb in (self._pal if self.use_custom_palette else self._pure_pal) for c in rgb])
+        pal_data = self._palette_bytes(not self.use_custom_palette)
+        img.putpalette(pal_data)
         
         # Paste frame
         if buf:
             frame_img = Image.frombytes('P', (pic_hdr.FrameWidth, pic_hdr.FrameHeight), buf)
-            frame_img.putpalette(img.getpalette())
+            frame_img.putpalette(pal_data)
             img.paste(frame_img, (pic_hdr.FrameLeft, pic_hdr.FrameTop))
         
         # Create shadow image if requested
         img_spec = None
         if bmp_spec is not None and bmp_spec is not RSFullBmp and sh_buf:
             img_spec = Image.new('P', (pic_hdr.Width, pic_hdr.Height), 0)
-            img_spec.putpalette([c for rgb in self._pure_pal for c in rgb])
+            pure_pal_data = self._palette_bytes(True)
+            img_spec.putpalette(pure_pal_data)
             
             frame_spec = Image.frombytes('P', (pic_hdr.FrameWidth, pic_hdr.FrameHeight), sh_buf)
-            frame_spec.putpalette(img_spec.getpalette())
+            frame_spec.putpalette(pure_pal_data)
             img_spec.paste(frame_spec, (pic_hdr.FrameLeft, pic_hdr.FrameTop))
         
         return img if bmp_spec is None else (img, img_spec)
@@ -786,40 +723,26 @@ class TRSDefMaker:
             return bytes(result)
         
         # Get pixel data
-        pixels = bmp.load()
-        buf = bytearray(frame_w * frame_h)
-        sh_buf = bytearray(frame_w * frame_h)
-        
-        for y in range(frame_h):
-            for x in range(frame_w):
-                px = pixels[r_left + x, r_top + y]
-                buf[y * frame_w + x] = px if isinstance(px, int) else px[0]
-                sh_buf[y * frame_w + x] = 255
+        rect = (r_left, r_top, r_right, r_bottom)
+        buf = _index_bytes(bmp.crop(rect))
         
         if spec:
-            spec_pixels = spec.load()
-            for y in range(frame_h):
-                for x in range(frame_w):
-                    px = spec_pixels[r_left + x, r_top + y]
-                    sh_buf[y * frame_w + x] = px if isinstance(px, int) else px[0]
+            sh_buf = _index_bytes(spec.crop(rect))
         else:
             # Convert buf to shadow
-            for i in range(len(sh_buf)):
-                if compr == 1:
-                    sh_buf[i] = buf[i] if buf[i] < 8 else 255
-                else:
-                    sh_buf[i] = buf[i] if buf[i] < 7 else 255
+            sh_buf = buf.translate(_SHADOW_FROM_MAIN_1 if compr == 1 else _SHADOW_FROM_MAIN_23)
         
         # Compress
+        body = b''
         if compr == 0:
-            result.extend(buf)
+            body = buf
         elif compr == 1:
             # Type 1 compression
             offset_table = bytearray(frame_h * 4)
-            compressed = bytearray()
+            compressed = io.BytesIO()
             
             for j in range(frame_h):
-                struct.pack_into('<I', offset_table, j * 4, len(compressed))
+                struct.pack_into('<I', offset_table, j * 4, compressed.tell())
                 i = 0
                 while i < frame_w:
                     code = sh_buf[j * frame_w + i]
@@ -829,14 +752,12 @@ class TRSDefMaker:
                         if length >= 256:
                             break
                     
-                    compressed.append(code)
-                    compressed.append(length - 1)
+                    compressed.write(bytes((code, length - 1)))
                     if code == 255:
-                        compressed.extend(buf[j * frame_w + i:j * frame_w + i + length])
+                        compressed.write(buf[j * frame_w + i:j * frame_w + i + length])
                     i += length
             
-            result.extend(offset_table)
-            result.extend(compressed)
+            body = b''.join((offset_table, compressed.getvalue()))
         
         elif compr in [2, 3]:
             # Type 2/3 compression
@@ -845,10 +766,10 @@ class TRSDefMaker:
                 frame_w = 32
             
             offset_table = bytearray(frame_h * 2)
-            compressed = bytearray()
+            compressed = io.BytesIO()
             
             for j in range(frame_h):
-                struct.pack_into('<H', offset_table, j * 2, len(compressed))
+                struct.pack_into('<H', offset_table, j * 2, compressed.tell())
                 i = 0
                 while i < frame_w:
                     code = sh_buf[j * frame_w + i]
@@ -858,17 +779,16 @@ class TRSDefMaker:
                         if length >= 32:
                             break
                     
-                    compressed.append((length - 1) | (code << 5))
+                    compressed.write(bytes(((length - 1) | (code << 5),)))
                     if code >= 7:
-                        compressed.extend(buf[j * frame_w + i:j * frame_w + i + length])
+                        compressed.write(buf[j * frame_w + i:j * frame_w + i + length])
                     i += length
             
-            result.extend(offset_table)
-            result.extend(compressed)
+            body = b''.join((offset_table, compressed.getvalue()))
         
         # Update file size
-        struct.pack_into('<I', result, 0, len(result) - 32)
-        return bytes(result)
+        struct.pack_into('<I', result, 0, len(body))
+        return b''.join((result, body))
     
     def make(self, stream):
         """Create DEF file and write to stream"""
@@ -1020,8 +940,6 @@ def rs_make_msk(def_wrapper_or_data, msk: Optional[TMsk] = None) -> TMsk:
     mask_object = bytearray(msk.MaskObject if msk.MaskObject else bytes(6))
     mask_shadow = bytearray(msk.MaskShadow if msk.MaskShadow else bytes(6))
     
-    def_wrapper._pic_links_needed()
-    
     for i in range(def_wrapper.pictures_count):
         try:
             pic_hdr, buf, sh_buf = def_wrapper._extract_buffer(i)
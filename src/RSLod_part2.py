@@ -245,20 +245,41 @@ class TRSMMFiles:
         """Extract file without decompression"""
         stream = self.get_as_is_file_stream(i, True)
         try:
-            if self.get_is_packed(i):
-                if not self.ignore_unzip_errors:
-                    data = stream.read(self.get_size(i))
-                    decompressed = zlib.decompress(data)
-                    output.write(decompressed)
-                else:
-                    from .RSLod import unzip_ignore_errors
-                    unzip_ignore_errors(output, stream, self.get_unpacked_size(i), True)
-            else:
-                data = stream.read(self.get_size(i))
-                output.write(data)
+            self._extract_from_stream(i, stream, output)
         finally:
             self.free_as_is_file_stream(i, stream)
     
+    def raw_extract_many(self, indices: List[int]) -> List[bytes]:
+        """Extract several files as bytes, reading them through one archive stream"""
+        result = []
+        stream = self.begin_read()
+        try:
+            for i in indices:
+                output = io.BytesIO()
+                if i < len(self.file_buffers) and self.file_buffers[i]:
+                    self.raw_extract(i, output)
+                else:
+                    stream.seek(self.get_address(i), 0)
+                    self._extract_from_stream(i, stream, output)
+                result.append(output.getvalue())
+        finally:
+            self.end_read(stream)
+        return result
+    
+    def _extract_from_stream(self, i: int, stream: BinaryIO, output: BinaryIO):
+        """Write file i to output, stream positioned at its data"""
+        if self.get_is_packed(i):
+            if not self.ignore_unzip_errors:
+                data = stream.read(self.get_size(i))
+                decompressed = zlib.decompress(data)
+                output.write(decompressed)
+            else:
+                from .RSLod import unzip_ignore_errors
+                unzip_ignore_errors(output, stream, self.get_unpacked_size(i), True)
+        else:
+            data = stream.read(self.get_size(i))
+            output.write(data)
+    
     def get_as_is_file_stream(self, index: int, ignore_write: bool = False) -> BinaryIO:
         """Get file stream"""
         if index < len(self.file_buffers) and self.file_buffers[index]:
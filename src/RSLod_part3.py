@@ -129,6 +129,10 @@ class TRSMMArchive(TRSArchive):
         self.files.raw_extract(index, mem)
         return mem.getvalue()
     
+    def extract_arrays(self, indices: List[int]) -> List[bytes]:
+        """Extract several files as bytes, opening the archive once"""
+        return self.files.raw_extract_many(indices)
+    
     def extract_string(self, index: int) -> str:
         """Extract file as string"""
         data = self.extract_array(index)